@@ -20,7 +20,7 @@ class RecipeAdmin(admin.ModelAdmin):
     empty_value_display = '-'
 
     def is_favorited(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
     def ingredients(self, obj):
         return obj.objects.values_list('ingredients')
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from .utils import cache_is_shared
+
+TOKEN_CACHE_SETTINGS = {
+    'TTL': 60,
+    'ENABLED': True,
+    'KEY_PREFIX': 'auth_token',
+}
+
+
+def get_token_cache_setting(name):
+    return getattr(settings, 'TOKEN_CACHE', {}).get(
+        name, TOKEN_CACHE_SETTINGS[name]
+    )
+
+
+def token_cache_enabled():
+    return get_token_cache_setting('ENABLED') and cache_is_shared()
+
+
+def get_cache_key(key):
+    return f'{get_token_cache_setting("KEY_PREFIX")}:{key}'
+
+
+def invalidate_tokens(keys):
+    """Удаляет токены из кэша Django."""
+    if not token_cache_enabled():
+        return
+    keys = [get_cache_key(key) for key in keys]
+    if keys:
+        cache.delete_many(keys)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену с кэшированием пользователя в кэше Django."""
+
+    def authenticate_credentials(self, key):
+        if not token_cache_enabled():
+            return super().authenticate_credentials(key)
+        cached = cache.get(get_cache_key(key))
+        if cached is None:
+            cached = super().authenticate_credentials(key)
+            cache.set(
+                get_cache_key(key), cached, get_token_cache_setting('TTL')
+            )
+            return cached
+        if not cached[0].is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        return cached
@@ -0,0 +1,200 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+
+from .utils import cache_is_shared, get_subscribed_ids
+
+CACHE_TIMEOUT = getattr(settings, 'API_CACHE_TIMEOUT', 60 * 60)
+
+
+def get_version_key(namespace):
+    return f'api:version:{namespace}'
+
+
+def get_versions(*namespaces):
+    """Текущие версии пространств имён кэша.
+
+    Начальная версия берётся из времени, чтобы после вытеснения ключа
+    версия не совпала с одной из прежних.
+    """
+    keys = [get_version_key(namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*namespaces):
+    """Инвалидирует всё, что закэшировано в пространствах имён."""
+    for namespace in namespaces:
+        try:
+            cache.incr(get_version_key(namespace))
+        except ValueError:
+            pass
+
+
+def make_key(namespaces, suffix):
+    versions = ':'.join(str(version) for version in get_versions(*namespaces))
+    digest = hashlib.md5(suffix.encode()).hexdigest()
+    return f'api:{":".join(namespaces)}:{versions}:{digest}'
+
+
+def recipe_namespaces(recipe_id, author_id):
+    return ('recipes', f'recipe:{recipe_id}', f'user:{author_id}')
+
+
+def invalidate_recipes(recipe_ids):
+    bump_versions(
+        'recipe_list',
+        *(f'recipe:{recipe_id}' for recipe_id in recipe_ids)
+    )
+
+
+def invalidate_user_marks(user_id, favorites=False):
+    """Инвалидирует отметки пользователя и, для избранного, популярность."""
+    namespaces = [f'user_state:{user_id}']
+    if favorites:
+        namespaces.append('popular')
+    bump_versions(*namespaces)
+
+
+def make_etag(namespaces, suffix):
+    """ETag из версий пространств имён, без построения тела ответа."""
+    return quote_etag(hashlib.md5(make_key(namespaces, suffix).encode())
+                      .hexdigest())
+
+
+def conditional_response(request, etag, get_response):
+    """Ответ 304, если у клиента актуальная версия, иначе обычный ответ."""
+    if not cache_is_shared():
+        return get_response()
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = get_response()
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Authorization', ))
+    return response
+
+
+def overlay_recipe(data, is_favorited, is_in_shopping_cart, is_subscribed):
+    """Подставляет в тело рецепта отметки текущего пользователя.
+
+    Поля, которых нет в теле из-за ?fields= или ?omit=, не добавляются.
+    """
+    data = dict(data)
+    if 'author' in data:
+        data['author'] = dict(data['author'], is_subscribed=is_subscribed)
+    for name, value in (('is_favorited', is_favorited),
+                        ('is_in_shopping_cart', is_in_shopping_cart)):
+        if name in data:
+            data[name] = value
+    return data
+
+
+class CachedListMixin:
+    """Кэширует список объектов, одинаковый для всех пользователей.
+
+    Запросы с параметрами из uncached_params не кэшируются: каждое
+    значение фильтра, набираемое по буквам, заняло бы свою запись.
+    """
+    cache_namespace = None
+    uncached_params = ()
+
+    def list(self, request, *args, **kwargs):
+        if not cache_is_shared() or any(
+                param in request.query_params
+                for param in self.uncached_params):
+            return super().list(request, *args, **kwargs)
+        key = make_key(
+            (self.cache_namespace, ),
+            request.build_absolute_uri()
+        )
+        data = cache.get(key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(key, data, CACHE_TIMEOUT)
+        return Response(data)
+
+
+class CachedRecipeMixin:
+    """Кэширует тело рецепта без отметок текущего пользователя.
+
+    Отметки берутся одним запросом и подставляются в готовое тело.
+    """
+
+    def get_cache_suffix(self, request):
+        return request.build_absolute_uri('/')
+
+    def retrieve(self, request, *args, **kwargs):
+        if not cache_is_shared():
+            return super().retrieve(request, *args, **kwargs)
+        queryset = self.get_queryset()
+        flags = get_object_or_404(
+            queryset.prefetch_related(None).values(
+                'author_id',
+                *(name for name in ('is_favorited', 'is_in_shopping_cart')
+                  if name in queryset.query.annotations)
+            ),
+            pk=kwargs['pk']
+        )
+        key = make_key(
+            recipe_namespaces(kwargs['pk'], flags['author_id']),
+            self.get_cache_suffix(request)
+        )
+        data = cache.get(key)
+        if data is None:
+            data = super().retrieve(request, *args, **kwargs).data
+            cache.set(key, data, CACHE_TIMEOUT)
+        return Response(overlay_recipe(
+            data,
+            is_favorited=flags.get('is_favorited'),
+            is_in_shopping_cart=flags.get('is_in_shopping_cart'),
+            is_subscribed=(
+                'author' in data
+                and flags['author_id'] in get_subscribed_ids(request)
+            )
+        ))
+
+
+class ConditionalGetMixin:
+    """Условные GET-запросы к list и retrieve по ETag.
+
+    ETag собирается из версий пространств имён кэша, адреса запроса и
+    пользователя, поэтому для ответа 304 не нужны ни запросы к базе,
+    ни сериализация.
+    """
+    etag_namespaces = ()
+
+    def get_etag_namespaces(self, request):
+        return self.etag_namespaces
+
+    def get_etag(self, request):
+        return make_etag(
+            self.get_etag_namespaces(request),
+            f'{request.build_absolute_uri()}:{request.user.id}'
+        )
+
+    def list(self, request, *args, **kwargs):
+        return conditional_response(
+            request,
+            self.get_etag(request),
+            lambda: super(ConditionalGetMixin, self).list(
+                request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return conditional_response(
+            request,
+            self.get_etag(request),
+            lambda: super(ConditionalGetMixin, self).retrieve(
+                request, *args, **kwargs)
+        )
@@ -0,0 +1,177 @@
+from django.conf import settings
+from rest_framework.fields import DateTimeField
+
+from recipes.models import IngredientRecipe, Recipe
+from .sparse import SparseFieldsMixin
+from .utils import get_subscribed_ids
+
+RECIPE_OUTPUT_FIELDS = (
+    'id',
+    'tags',
+    'ingredients',
+    'author',
+    'is_favorited',
+    'is_in_shopping_cart',
+    'name',
+    'text',
+    'cooking_time',
+    'image',
+    'pub_date',
+)
+RECIPE_COLUMNS = {
+    'id': ('id', ),
+    'author': (
+        'author_id',
+        'author__email',
+        'author__username',
+        'author__first_name',
+        'author__last_name',
+    ),
+    'name': ('name', ),
+    'text': ('text', ),
+    'cooking_time': ('cooking_time', ),
+    'image': ('image', ),
+    'pub_date': ('pub_date', ),
+}
+RECIPE_FLAGS = ('is_favorited', 'is_in_shopping_cart')
+
+
+def fast_read_enabled():
+    return getattr(settings, 'API_FAST_READ', True)
+
+
+def recipe_columns(fields):
+    """Столбцы рецепта для полей ответа.
+
+    id и pub_date загружаются всегда: по ним работает пагинация.
+    """
+    columns = ['id', 'pub_date']
+    for name in fields:
+        columns.extend(
+            column for column in RECIPE_COLUMNS.get(name, ())
+            if column not in columns
+        )
+    return columns
+
+
+def recipe_rows(queryset, fields=None):
+    """Строки рецептов для быстрого чтения вместо объектов модели.
+
+    Фильтры, аннотации и сортировка выборки сохраняются, связанные
+    тэги и ингредиенты догружает serialize_recipes.
+    """
+    if fields is None:
+        fields = RECIPE_OUTPUT_FIELDS
+    return queryset.prefetch_related(None).values(
+        *recipe_columns(fields),
+        *(flag for flag in RECIPE_FLAGS if flag in fields)
+    )
+
+
+def get_recipe_tags(recipe_ids):
+    tags = {}
+    for row in Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('tag_id').values_list(
+        'recipe_id', 'tag_id', 'tag__name', 'tag__color', 'tag__slug'
+    ):
+        tags.setdefault(row[0], []).append({
+            'id': row[1],
+            'name': row[2],
+            'color': row[3],
+            'slug': row[4],
+        })
+    return tags
+
+
+def get_recipe_ingredients(recipe_ids):
+    ingredients = {}
+    for row in IngredientRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('id').values_list(
+        'recipe_id', 'ingredient_id', 'ingredient__name',
+        'ingredient__measurement_unit', 'amount'
+    ):
+        ingredients.setdefault(row[0], []).append({
+            'id': row[1],
+            'name': row[2],
+            'measurement_unit': row[3],
+            'amount': row[4],
+        })
+    return ingredients
+
+
+def serialize_recipes(rows, request, fields=None):
+    """Рецепты в том же виде, что у RecipeSerializer, без его полей.
+
+    Тэги и ингредиенты страницы загружаются двумя запросами, и только
+    если они есть среди fields. Ключи словарей идут в порядке полей
+    серилизатора, поэтому JSON ответа совпадает побайтно.
+    """
+    if fields is None:
+        fields = RECIPE_OUTPUT_FIELDS
+    rows = list(rows)
+    recipe_ids = [row['id'] for row in rows]
+    tags = get_recipe_tags(recipe_ids) if 'tags' in fields else {}
+    ingredients = (
+        get_recipe_ingredients(recipe_ids) if 'ingredients' in fields
+        else {}
+    )
+    subscribed_ids = (
+        get_subscribed_ids(request) if 'author' in fields else frozenset()
+    )
+    storage = Recipe._meta.get_field('image').storage
+    pub_date = DateTimeField().to_representation
+    builders = {
+        'id': lambda row: row['id'],
+        'tags': lambda row: tags.get(row['id'], []),
+        'ingredients': lambda row: ingredients.get(row['id'], []),
+        'author': lambda row: {
+            'id': row['author_id'],
+            'email': row['author__email'],
+            'username': row['author__username'],
+            'first_name': row['author__first_name'],
+            'last_name': row['author__last_name'],
+            'is_subscribed': row['author_id'] in subscribed_ids,
+        },
+        'is_favorited': lambda row: row['is_favorited'],
+        'is_in_shopping_cart': lambda row: row['is_in_shopping_cart'],
+        'name': lambda row: row['name'],
+        'text': lambda row: row['text'],
+        'cooking_time': lambda row: row['cooking_time'],
+        'image': lambda row: (
+            request.build_absolute_uri(storage.url(row['image']))
+            if row['image'] else None
+        ),
+        'pub_date': lambda row: pub_date(row['pub_date']),
+    }
+    builders = [(name, builders[name]) for name in fields]
+    return [
+        {name: build(row) for name, build in builders}
+        for row in rows
+    ]
+
+
+class FastRecipeListMixin(SparseFieldsMixin):
+    """Список рецептов через recipe_rows и serialize_recipes.
+
+    Учитывает поля из ?fields= и ?omit=. Отключается настройкой
+    API_FAST_READ = False, тогда список строит RecipeSerializer.
+    """
+
+    def fast_list(self, queryset):
+        if not fast_read_enabled():
+            page = self.paginate_queryset(queryset)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        page = self.paginate_queryset(
+            recipe_rows(queryset, self.sparse_fields)
+        )
+        return self.get_paginated_response(
+            serialize_recipes(page, self.request, self.sparse_fields)
+        )
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is None:
+            return super().list(request, *args, **kwargs)
+        return self.fast_list(self.filter_queryset(self.get_queryset()))
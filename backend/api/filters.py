@@ -1,15 +1,29 @@
+from django.db.models import Count, Exists, OuterRef
 from django_filters.rest_framework import filters, FilterSet
-from rest_framework.filters import SearchFilter
+from rest_framework.filters import BaseFilterBackend
 
 
 from recipes.models import Recipe, Tag
+from recipes.search import search_recipes
 from users.models import User
 
 
-class IngredientFilter(SearchFilter):
-    """Фильтр ингредиента для поиска по названию."""
+class IngredientFilter(BaseFilterBackend):
+    """Фильтр ингредиента по началу названия.
+
+    Названия хранятся в нижнем регистре (старые строки приводит к нему
+    миграция 0006), поэтому запрос приводится к нему и сравнивается
+    через регистрозависимый LIKE 'x%', который в Postgres обслуживает
+    индекс varchar_pattern_ops.
+    """
     search_param = 'name'
 
+    def filter_queryset(self, request, queryset, view):
+        name = request.query_params.get(self.search_param, '').strip()
+        if not name:
+            return queryset
+        return queryset.filter(name__startswith=name.lower())
+
 
 class RecipeFilter(FilterSet):
     """Фильтр рецепта."""
@@ -20,6 +34,7 @@ class RecipeFilter(FilterSet):
         field_name='tags__slug',
         queryset=Tag.objects.all(),
         to_field_name='slug',
+        method='get_tags'
     )
     is_favorited = filters.BooleanFilter(
         method='get_is_favorited'
@@ -27,6 +42,13 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart'
     )
+    search = filters.CharFilter(
+        method='get_search'
+    )
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'По популярности'), ),
+        method='get_ordering'
+    )
 
     class Meta:
         model = Recipe
@@ -34,9 +56,20 @@ class RecipeFilter(FilterSet):
             'tags',
             'author',
             'is_favorited',
-            'is_in_shopping_cart'
+            'is_in_shopping_cart',
+            'search',
+            'ordering'
         )
 
+    def get_tags(self, queryset, name, value):
+        """Рецепты хотя бы с одним из тэгов, без JOIN и дублей строк."""
+        if not value:
+            return queryset
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef('pk'),
+            tag_id__in=[tag.id for tag in value]
+        )))
+
     def get_is_favorited(self, queryset, name, value):
         if value:
             return queryset.filter(favorites__user=self.request.user)
@@ -46,3 +79,28 @@ class RecipeFilter(FilterSet):
         if value:
             return queryset.filter(recipe_in_cart__user=self.request.user)
         return queryset
+
+    def get_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def get_ordering(self, queryset, name, value):
+        if value == 'popular':
+            return queryset.order_by('-favorites_count', '-pub_date', '-id')
+        return queryset
+
+
+def get_tag_facets(queryset):
+    """Количество рецептов выборки по каждому тэгу одним запросом."""
+    return [
+        {
+            'id': row['tag_id'],
+            'name': row['tag__name'],
+            'slug': row['tag__slug'],
+            'count': row['count'],
+        }
+        for row in Recipe.tags.through.objects.filter(
+            recipe_id__in=queryset.order_by().values('pk')
+        ).values(
+            'tag_id', 'tag__name', 'tag__slug'
+        ).annotate(count=Count('recipe_id')).order_by('-count', 'tag__name')
+    ]
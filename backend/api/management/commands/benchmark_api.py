@@ -0,0 +1,218 @@
+import json
+import math
+import subprocess
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.metrics import QueryRecorder
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Subscription, User
+
+SCENARIOS = (
+    ('recipes_list', '/api/recipes/', False),
+    ('recipes_list_auth', '/api/recipes/', True),
+    ('recipes_page_10', '/api/recipes/?page=10', True),
+    ('recipes_cursor', '/api/recipes/?pagination=cursor', True),
+    ('recipes_tags', '/api/recipes/?tags={tag}', True),
+    ('recipes_tags_facets', '/api/recipes/?tags={tag}&facets=1', True),
+    ('recipes_author', '/api/recipes/?author={author_id}', True),
+    ('recipes_popular', '/api/recipes/?ordering=popular', True),
+    ('recipes_search', '/api/recipes/?search={word}', True),
+    ('recipes_favorited', '/api/recipes/?is_favorited=1', True),
+    ('recipe_detail', '/api/recipes/{recipe_id}/', True),
+    ('recipes_feed', '/api/recipes/feed/', True),
+    ('shopping_cart_txt', '/api/recipes/download_shopping_cart/', True),
+    ('users_list', '/api/users/', True),
+    ('users_me', '/api/users/me/', True),
+    ('user_detail', '/api/users/{author_id}/', True),
+    ('subscriptions', '/api/users/subscriptions/?recipes_limit=3', True),
+    ('tags_list', '/api/tags/', False),
+    ('ingredients_prefix', '/api/ingredients/?name={prefix}', False),
+    ('ingredients_autocomplete',
+     '/api/ingredients/autocomplete/?name={prefix}', False),
+)
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    values = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет эндпоинты API через тестовый клиент и сохраняет '
+        'p50/p95 времени ответа и число SQL-запросов в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Очищать кэш перед каждым запросом.'
+        )
+        parser.add_argument(
+            '--only',
+            nargs='+',
+            help='Имена сценариев, которые нужно прогнать.'
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл, в который сохраняются результаты.'
+        )
+        parser.add_argument(
+            '--compare',
+            help='Файл с прошлыми результатами для сравнения.'
+        )
+
+    def get_user(self):
+        row = Subscription.objects.values('following').annotate(
+            total=Count('pk')
+        ).order_by('-total', 'following').first()
+        if row is not None:
+            return User.objects.get(pk=row['following'])
+        user = User.objects.order_by('id').first()
+        if user is None:
+            raise CommandError(
+                'Нет данных: сначала выполните generate_data'
+            )
+        return user
+
+    def get_context(self, user):
+        recipe = Recipe.objects.order_by('-favorites_count', 'id').first()
+        author = User.objects.order_by('-recipes_count', 'id').first()
+        tag = Tag.objects.order_by('id').first()
+        ingredient = Ingredient.objects.order_by('id').first()
+        name = Recipe.objects.order_by('id').values_list(
+            'name', flat=True
+        ).first() or ''
+        return {
+            'recipe_id': recipe.id if recipe else 0,
+            'author_id': author.id,
+            'user_id': user.id,
+            'tag': tag.slug if tag else '',
+            'word': name.split()[0] if name else '',
+            'prefix': ingredient.name[:3] if ingredient else '',
+        }
+
+    def get_dataset(self):
+        return {
+            model.__name__: model.objects.count()
+            for model in (User, Recipe, IngredientRecipe, Tag, Ingredient,
+                          Favorite, ShoppingCart, Subscription)
+        }
+
+    def request(self, client, url, cold):
+        if cold:
+            cache.clear()
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return (
+            (time.perf_counter() - started) * 1000,
+            recorder.queries,
+            response.status_code
+        )
+
+    def run_scenario(self, client, url, options):
+        for _ in range(options['warmup']):
+            self.request(client, url, options['cold'])
+        timings = []
+        queries = []
+        statuses = set()
+        for _ in range(options['iterations']):
+            elapsed, count, status = self.request(
+                client, url, options['cold'])
+            timings.append(elapsed)
+            queries.append(count)
+            statuses.add(status)
+        return {
+            'url': url,
+            'status': sorted(statuses),
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'queries': max(queries),
+        }
+
+    def compare(self, results, path):
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)['results']
+        for name, result in results.items():
+            old = baseline.get(name)
+            if old is None:
+                self.stdout.write(f'{name}: нет в базовом замере')
+                continue
+            change = (
+                (result['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100
+                if old['p50_ms'] else 0
+            )
+            self.stdout.write(
+                f'{name}: p50 {old["p50_ms"]} -> {result["p50_ms"]} мс '
+                f'({change:+.1f}%), запросов {old["queries"]} -> '
+                f'{result["queries"]}'
+            )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('Нужна хотя бы одна итерация')
+        user = self.get_user()
+        context = self.get_context(user)
+        token, _ = Token.objects.get_or_create(user=user)
+        clients = {False: APIClient(), True: APIClient()}
+        clients[True].credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        results = {}
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for name, url, authenticated in SCENARIOS:
+                if options['only'] and name not in options['only']:
+                    continue
+                results[name] = self.run_scenario(
+                    clients[authenticated], url.format(**context), options
+                )
+                self.stdout.write(
+                    f'{name}: p50 {results[name]["p50_ms"]} мс, '
+                    f'p95 {results[name]["p95_ms"]} мс, '
+                    f'запросов {results[name]["queries"]}'
+                )
+        if options['compare']:
+            self.compare(results, options['compare'])
+        if options['output']:
+            report = {
+                'created': datetime.now(timezone.utc).isoformat(),
+                'commit': get_commit(),
+                'database': connection.vendor,
+                'iterations': options['iterations'],
+                'cold': options['cold'],
+                'dataset': self.get_dataset(),
+                'results': results,
+            }
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f'Результаты сохранены в {options["output"]}'
+            ))
@@ -0,0 +1,102 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.fast_read import recipe_rows, serialize_recipes
+from api.metrics import QueryRecorder
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import RecipeSerializer
+from api.views import RecipeViewSet
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает скорость списка рецептов через RecipeSerializer и '
+        'JSONRenderer с быстрым чтением через .values() и '
+        'FastJSONRenderer, проверяя, что JSON совпадает побайтно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--user',
+            type=int,
+            help='id пользователя, от имени которого строится список.'
+        )
+
+    def get_view(self, user_id):
+        request = APIRequestFactory().get('/api/recipes/')
+        if user_id is not None:
+            user = User.objects.filter(pk=user_id).first()
+            if user is None:
+                raise CommandError(f'Нет пользователя с id={user_id}')
+            force_authenticate(request, user=user)
+        view = RecipeViewSet(
+            action_map={'get': 'list'}, format_kwarg=None, kwargs={}
+        )
+        view.request = view.initialize_request(request)
+        return view
+
+    def serializer_path(self, view, queryset):
+        data = RecipeSerializer(
+            queryset.all(),
+            many=True,
+            context={'request': view.request}
+        ).data
+        return JSONRenderer().render(data)
+
+    def fast_path(self, view, queryset):
+        data = serialize_recipes(recipe_rows(queryset), view.request)
+        return FastJSONRenderer().render(data)
+
+    def measure(self, func, view, queryset, options):
+        for _ in range(options['warmup']):
+            func(view, queryset)
+        timings = []
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                content = func(view, queryset)
+                timings.append(time.perf_counter() - started)
+        return content, min(timings), recorder.queries // options['repeat']
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1 or options['page_size'] < 1:
+            raise CommandError('Нужны положительные --repeat и --page-size')
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            view = self.get_view(options['user'])
+            queryset = view.get_queryset()[:options['page_size']]
+            count = queryset.count()
+            if not count:
+                raise CommandError(
+                    'Нет данных: сначала выполните generate_data'
+                )
+            results = {}
+            for name, func in (('serializer', self.serializer_path),
+                               ('fast', self.fast_path)):
+                results[name] = self.measure(func, view, queryset, options)
+        if results['serializer'][0] != results['fast'][0]:
+            raise CommandError(
+                'JSON быстрого чтения отличается от серилизатора'
+            )
+        if orjson is None:
+            self.stdout.write('orjson не установлен, используется json')
+        for name, (content, best, queries) in results.items():
+            self.stdout.write(
+                f'{name}: {best * 1000:.2f} мс на {count} рецептов, '
+                f'{count / best:.0f} рецептов/с, запросов {queries}, '
+                f'{len(content)} байт'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Ускорение: {:.1f}x, ответы совпадают'.format(
+                results['serializer'][1] / results['fast'][1]
+            )
+        ))
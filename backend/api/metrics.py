@@ -0,0 +1,210 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .prometheus import observe_request
+
+logger = logging.getLogger(__name__)
+
+METRICS_SETTINGS = {
+    'HEADERS': False,
+    'BUDGET_MODE': 'log',
+}
+BUDGET_OFF = 'off'
+BUDGET_LOG = 'log'
+BUDGET_RAISE = 'raise'
+
+
+def get_metrics_setting(name):
+    return getattr(settings, 'API_METRICS', {}).get(
+        name, METRICS_SETTINGS[name]
+    )
+
+
+class QueryBudgetExceededError(Exception):
+    """Представление сделало больше SQL-запросов, чем ему разрешено."""
+
+
+class QueryRecorder:
+    """Обёртка выполнения SQL, считающая запросы и их время."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - start
+
+
+class ViewMetrics:
+    """Суммарные показатели представлений в памяти процесса."""
+    fields = (
+        'queries', 'sql_time', 'view_time', 'render_time', 'total_time'
+    )
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}
+
+    def record(self, view, over_budget, **values):
+        with self.lock:
+            stats = self.data.get(view)
+            if stats is None:
+                stats = self.data[view] = dict.fromkeys(
+                    ('requests', 'over_budget'), 0
+                )
+                for field in self.fields:
+                    stats[field] = 0
+                    stats[f'max_{field}'] = 0
+            stats['requests'] += 1
+            stats['over_budget'] += over_budget
+            for field in self.fields:
+                stats[field] += values[field]
+                stats[f'max_{field}'] = max(
+                    stats[f'max_{field}'], values[field]
+                )
+
+    def snapshot(self):
+        """Средние и максимальные значения по каждому представлению."""
+        with self.lock:
+            data = {view: dict(stats) for view, stats in self.data.items()}
+        result = []
+        for view, stats in data.items():
+            row = {
+                'view': view,
+                'requests': stats['requests'],
+                'over_budget': stats['over_budget'],
+            }
+            for field in self.fields:
+                row[f'avg_{field}'] = round(
+                    stats[field] / stats['requests'], 4
+                )
+                row[f'max_{field}'] = round(stats[f'max_{field}'], 4)
+            result.append(row)
+        return sorted(
+            result,
+            key=lambda row: row['avg_total_time'] * row['requests'],
+            reverse=True
+        )
+
+    def reset(self):
+        with self.lock:
+            self.data.clear()
+
+
+view_metrics = ViewMetrics()
+
+
+def get_view_name(view_func, method):
+    """Имя представления вида RecipeViewSet.list."""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(method.lower(), method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+def get_query_budget(view_func, method):
+    """Бюджет запросов из атрибута query_budgets класса представления."""
+    view_class = getattr(view_func, 'cls', None)
+    budgets = getattr(view_class, 'query_budgets', None)
+    if not budgets:
+        return None
+    actions = getattr(view_func, 'actions', None) or {}
+    return budgets.get(actions.get(method.lower(), method.lower()))
+
+
+class QueryMetricsMiddleware:
+    """Замеряет число и время SQL-запросов, представления и всего запроса.
+
+    view_time — время работы представления без SQL и рендеринга:
+    проверки доступа, фильтры, сериализация. Показатели копятся в
+    view_metrics и метриках Prometheus, а с настройкой
+    API_METRICS['HEADERS'] попадают и в заголовки X-*. Запросы
+    потоковых ответов, выполненные после возврата из middleware, не
+    учитываются.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        request._metrics_recorder = recorder
+        request._metrics_view = None
+        request._metrics_rendered_at = None
+        request._metrics_rendered_sql_time = None
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        finished = time.perf_counter()
+        view_func = request._metrics_view
+        if view_func is None:
+            return response
+        rendered_at = request._metrics_rendered_at or finished
+        rendered_sql_time = request._metrics_rendered_sql_time
+        if rendered_sql_time is None:
+            rendered_sql_time = recorder.sql_time
+        values = {
+            'queries': recorder.queries,
+            'sql_time': recorder.sql_time,
+            'view_time': (
+                rendered_at - request._metrics_view_started
+                - (rendered_sql_time - request._metrics_view_sql_time)
+            ),
+            'render_time': finished - rendered_at,
+            'total_time': finished - start,
+        }
+        view = get_view_name(view_func, request.method)
+        budget = get_query_budget(view_func, request.method)
+        over_budget = budget is not None and recorder.queries > budget
+        view_metrics.record(view, over_budget, **values)
+        observe_request(
+            view,
+            request.method,
+            response.status_code,
+            values['total_time'],
+            values['sql_time'],
+            recorder.queries,
+            None if response.streaming else len(response.content)
+        )
+        if get_metrics_setting('HEADERS'):
+            response['X-Query-Count'] = recorder.queries
+            if budget is not None:
+                response['X-Query-Budget'] = budget
+            response['X-Query-Time'] = f'{values["sql_time"] * 1000:.2f}'
+            response['X-View-Time'] = f'{values["view_time"] * 1000:.2f}'
+            response['X-Render-Time'] = f'{values["render_time"] * 1000:.2f}'
+            response['X-Response-Time'] = f'{values["total_time"] * 1000:.2f}'
+        if over_budget:
+            self.budget_exceeded(view, recorder.queries, budget)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_view = view_func
+        request._metrics_view_started = time.perf_counter()
+        request._metrics_view_sql_time = request._metrics_recorder.sql_time
+
+    def process_template_response(self, request, response):
+        request._metrics_rendered_at = time.perf_counter()
+        request._metrics_rendered_sql_time = (
+            request._metrics_recorder.sql_time
+        )
+        return response
+
+    def budget_exceeded(self, view, queries, budget):
+        mode = get_metrics_setting('BUDGET_MODE')
+        message = f'{view}: {queries} SQL-запросов при бюджете {budget}'
+        if mode == BUDGET_RAISE:
+            raise QueryBudgetExceededError(message)
+        if mode == BUDGET_LOG:
+            logger.warning(message)
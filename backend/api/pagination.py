@@ -0,0 +1,45 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class LimitPageNumberPagination(PageNumberPagination):
+    """Постраничная пагинация с размером страницы из параметра limit."""
+    page_size = 6
+    page_size_query_param = 'limit'
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Пагинация по курсору для ленты рецептов."""
+    page_size = 6
+    page_size_query_param = 'limit'
+    ordering = ('-pub_date', '-id')
+
+
+class RecipePagination(LimitPageNumberPagination):
+    """Пагинация рецептов.
+
+    По умолчанию постраничная, с параметром pagination=cursor или cursor
+    переключается на пагинацию по курсору без COUNT и OFFSET. Курсор
+    DRF сравнивает только первое поле сортировки, а у большинства
+    рецептов одинаковое число добавлений в избранное, поэтому с
+    ordering=popular пагинация остаётся постраничной.
+    """
+    cursor_pagination_class = RecipeCursorPagination
+    cursor = None
+
+    def use_cursor(self, request):
+        if request.query_params.get('ordering') == 'popular':
+            return False
+        return (request.query_params.get('pagination') == 'cursor'
+                or self.cursor_pagination_class.cursor_query_param
+                in request.query_params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request):
+            self.cursor = self.cursor_pagination_class()
+            return self.cursor.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor is not None:
+            return self.cursor.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,190 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import CachedTokenAuthentication
+
+PROFILING_SETTINGS = {
+    'ENABLED': False,
+    'DIR': 'profiles',
+    'MAX_PROFILES': 50,
+    'TOP': 40,
+}
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = '_profile'
+PROFILE_ID_RE = re.compile(r'^\d{20}-[0-9a-f]{8}$')
+
+
+def get_profiling_setting(name):
+    return getattr(settings, 'PROFILING', {}).get(
+        name, PROFILING_SETTINGS[name]
+    )
+
+
+class SQLRecorder:
+    """Обёртка выполнения SQL, запоминающая запросы и их время."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'params': repr(params)[:500],
+                'many': many,
+                'time_ms': round((time.perf_counter() - start) * 1000, 3),
+            })
+
+
+class ProfileStore:
+    """Кольцевой буфер профилей на диске.
+
+    Каждый профиль — это файл .prof для pstats и .json со сводкой:
+    таблицей самых затратных вызовов и SQL-запросами. Сверх
+    MAX_PROFILES удаляются самые старые.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    @property
+    def directory(self):
+        return get_profiling_setting('DIR')
+
+    def path(self, profile_id, extension):
+        if not PROFILE_ID_RE.match(profile_id):
+            raise ValueError(f'Некорректный id профиля: {profile_id}')
+        return os.path.join(self.directory, f'{profile_id}.{extension}')
+
+    def ids(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            (name[:-5] for name in names
+             if name.endswith('.json') and PROFILE_ID_RE.match(name[:-5])),
+            reverse=True
+        )
+
+    def save(self, profile, summary):
+        profile_id = '{}-{}'.format(
+            datetime.now().strftime('%Y%m%d%H%M%S%f'), uuid.uuid4().hex[:8]
+        )
+        summary = dict(summary, id=profile_id)
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            profile.dump_stats(self.path(profile_id, 'prof'))
+            with open(self.path(profile_id, 'json'), 'w',
+                      encoding='utf-8') as file:
+                json.dump(summary, file, ensure_ascii=False)
+            for old_id in self.ids()[get_profiling_setting('MAX_PROFILES'):]:
+                for extension in ('json', 'prof'):
+                    try:
+                        os.remove(self.path(old_id, extension))
+                    except FileNotFoundError:
+                        pass
+        return profile_id
+
+    def get(self, profile_id):
+        """Сводка профиля или None, если он уже вытеснен из буфера."""
+        try:
+            with open(self.path(profile_id, 'json'),
+                      encoding='utf-8') as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def list(self):
+        summaries = (self.get(profile_id) for profile_id in self.ids())
+        return [
+            {key: summary[key] for key in (
+                'id', 'created', 'method', 'path', 'status', 'user',
+                'total_ms', 'queries', 'sql_ms'
+            )}
+            for summary in summaries if summary is not None
+        ]
+
+
+profile_store = ProfileStore()
+
+
+class ProfilingMiddleware:
+    """Профилирует запрос сотрудника по заголовку X-Profile или ?_profile.
+
+    Запрос выполняется под cProfile с записью SQL, профиль сохраняется
+    в profile_store, а его id возвращается в заголовке X-Profile-Id.
+    Без PROFILING['ENABLED'] middleware отключается при старте, для
+    остальных запросов проверяется только наличие флага.
+    """
+
+    def __init__(self, get_response):
+        if not get_profiling_setting('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (PROFILE_HEADER not in request.META
+                and PROFILE_PARAM not in request.GET):
+            return self.get_response(request)
+        user = self.get_user(request)
+        if user is None or not user.is_staff:
+            return self.get_response(request)
+        return self.profile(request, user)
+
+    def get_user(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user
+        try:
+            authenticated = CachedTokenAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return None
+        return authenticated[0] if authenticated else None
+
+    def profile(self, request, user):
+        recorder = SQLRecorder()
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            profile.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profile.disable()
+        total = time.perf_counter() - start
+        stream = io.StringIO()
+        pstats.Stats(profile, stream=stream).sort_stats(
+            'cumulative'
+        ).print_stats(get_profiling_setting('TOP'))
+        response['X-Profile-Id'] = profile_store.save(profile, {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'user': user.id,
+            'total_ms': round(total * 1000, 3),
+            'queries': len(recorder.queries),
+            'sql_ms': round(
+                sum(query['time_ms'] for query in recorder.queries), 3
+            ),
+            'stats': stream.getvalue(),
+            'sql': recorder.queries,
+        })
+        return response
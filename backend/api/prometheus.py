@@ -0,0 +1,297 @@
+import hmac
+import ipaddress
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+from django.conf import settings
+
+PROMETHEUS_SETTINGS = {
+    'MULTIPROCESS_DIR': None,
+    'FLUSH_INTERVAL': 1.0,
+    'ALLOWED_IPS': ('127.0.0.1', '::1'),
+    'TOKEN': None,
+}
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def get_prometheus_setting(name):
+    return getattr(settings, 'PROMETHEUS', {}).get(
+        name, PROMETHEUS_SETTINGS[name]
+    )
+
+
+def access_allowed(request):
+    """Можно ли отдать метрики: по токену Bearer или адресу клиента.
+
+    ALLOWED_IPS содержит адреса и подсети, с которых метрики доступны
+    без токена. Адрес берётся из REMOTE_ADDR, поэтому за прокси его
+    нужно указывать для прямого доступа к приложению, а не к прокси.
+    """
+    token = get_prometheus_setting('TOKEN')
+    if token:
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if hmac.compare_digest(header.encode(), f'Bearer {token}'.encode()):
+            return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in get_prometheus_setting('ALLOWED_IPS')
+    )
+
+
+class Counter:
+    """Счётчик с метками."""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values = {}
+
+    def inc(self, labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dump(self):
+        return [[list(labels), value] for labels, value in self.values.items()]
+
+    def merge(self, merged, rows):
+        for labels, value in rows:
+            labels = tuple(labels)
+            merged[labels] = merged.get(labels, 0) + value
+
+    def samples(self, merged):
+        for labels, value in sorted(merged.items()):
+            yield self.name, self.labelnames, labels, value
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self.values = {}
+
+    def observe(self, labels, value):
+        state = self.values.get(labels)
+        if state is None:
+            state = self.values[labels] = [
+                [0] * (len(self.buckets) + 1), 0.0
+            ]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def dump(self):
+        return [
+            [list(labels), counts[:], total]
+            for labels, (counts, total) in self.values.items()
+        ]
+
+    def merge(self, merged, rows):
+        for labels, counts, total in rows:
+            labels = tuple(labels)
+            state = merged.get(labels)
+            if state is None:
+                merged[labels] = [list(counts), total]
+                continue
+            for index, count in enumerate(counts):
+                state[0][index] += count
+            state[1] += total
+
+    def samples(self, merged):
+        labelnames = self.labelnames + ('le', )
+        for labels, (counts, total) in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield (f'{self.name}_bucket', labelnames,
+                       labels + (format_value(bound), ), cumulative)
+            cumulative += counts[-1]
+            yield (f'{self.name}_bucket', labelnames, labels + ('+Inf', ),
+                   cumulative)
+            yield f'{self.name}_sum', self.labelnames, labels, total
+            yield f'{self.name}_count', self.labelnames, labels, cumulative
+
+
+def format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def escape_label(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+class MetricsRegistry:
+    """Реестр метрик процесса с многопроцессным режимом через файлы.
+
+    Значения копятся в словарях процесса. Если задан
+    PROMETHEUS['MULTIPROCESS_DIR'], процесс не чаще FLUSH_INTERVAL
+    секунд записывает свой снимок в файл metrics-<pid>-<id>.json, а при
+    выдаче метрик снимки всех воркеров суммируются. Случайный id не
+    даёт процессу с повторно выданным pid перезаписать файл
+    завершённого воркера: такие файлы остаются, чтобы счётчики не
+    уменьшались.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.flushed_at = 0.0
+        self.file_pid = None
+        self.file_name = None
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames, buckets):
+        return self.register(
+            Histogram(name, documentation, labelnames, buckets)
+        )
+
+    @property
+    def directory(self):
+        return get_prometheus_setting('MULTIPROCESS_DIR')
+
+    def get_file_name(self):
+        """Имя файла снимка, своё у каждого процесса, и после fork."""
+        pid = os.getpid()
+        if self.file_pid != pid:
+            self.file_name = f'metrics-{pid}-{uuid.uuid4().hex}.json'
+            self.file_pid = pid
+        return self.file_name
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: metric.dump() for name, metric in self.metrics.items()
+            }
+
+    def flush(self):
+        """Записывает снимок процесса в каталог многопроцессного режима."""
+        self.flushed_at = time.monotonic()
+        directory = self.directory
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.get_file_name())
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(temporary, path)
+
+    def maybe_flush(self):
+        if (time.monotonic() - self.flushed_at
+                >= get_prometheus_setting('FLUSH_INTERVAL')):
+            self.flush()
+
+    def read_snapshots(self):
+        """Снимки других процессов из каталога многопроцессного режима."""
+        directory = self.directory
+        if not directory:
+            return []
+        own = self.get_file_name()
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+        snapshots = []
+        for name in names:
+            if not name.endswith('.json') or name == own:
+                continue
+            try:
+                with open(os.path.join(directory, name)) as file:
+                    snapshots.append(json.load(file))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def collect(self):
+        """Снимки всех процессов, сложенные по меткам."""
+        merged = {name: {} for name in self.metrics}
+        for snapshot in [self.snapshot()] + self.read_snapshots():
+            for name, rows in snapshot.items():
+                if name in self.metrics:
+                    self.metrics[name].merge(merged[name], rows)
+        return merged
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus."""
+        lines = []
+        for name, values in self.collect().items():
+            metric = self.metrics[name]
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for sample, labelnames, labels, value in metric.samples(values):
+                label_text = ','.join(
+                    f'{label}="{escape_label(label_value)}"'
+                    for label, label_value in zip(labelnames, labels)
+                )
+                lines.append(f'{sample}{{{label_text}}} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+requests_total = registry.counter(
+    'foodgram_http_requests_total',
+    'Количество запросов к представлениям.',
+    ('view', 'method', 'status')
+)
+request_duration = registry.histogram(
+    'foodgram_http_request_duration_seconds',
+    'Время обработки запроса.',
+    ('view', ),
+    LATENCY_BUCKETS
+)
+db_duration = registry.histogram(
+    'foodgram_db_duration_seconds',
+    'Время SQL-запросов за один запрос к API.',
+    ('view', ),
+    LATENCY_BUCKETS
+)
+db_queries_total = registry.counter(
+    'foodgram_db_queries_total',
+    'Количество SQL-запросов.',
+    ('view', )
+)
+response_size = registry.histogram(
+    'foodgram_http_response_size_bytes',
+    'Размер тела ответа.',
+    ('view', ),
+    SIZE_BUCKETS
+)
+
+
+def observe_request(view, method, status, total_time, sql_time, queries,
+                    size):
+    """Учитывает один запрос во всех метриках."""
+    labels = (view, )
+    with registry.lock:
+        requests_total.inc((view, method, str(status)))
+        request_duration.observe(labels, total_time)
+        db_duration.observe(labels, sql_time)
+        db_queries_total.inc(labels, queries)
+        if size is not None:
+            response_size.observe(labels, size)
+    registry.maybe_flush()
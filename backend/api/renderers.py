@@ -0,0 +1,65 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ExportRenderer(JSONRenderer):
+    """Рендерер выгрузки файла.
+
+    Сам файл отдаётся потоковым ответом, через рендерер проходят
+    только ответы с ошибками, они остаются в JSON и с типом JSON.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = 'application/json'
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class TextExportRenderer(ExportRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVExportRenderer(ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class PDFExportRenderer(ExportRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSON-рендерер на orjson с тем же результатом, что у JSONRenderer.
+
+    Нестандартные типы, в том числе даты, кодируются как в DRF. Если
+    orjson не установлен, запрошен отступ или настройки вывода
+    отличаются от компактного UTF-8, используется обычный рендерер.
+    Числа с плавающей точкой orjson записывает иначе, поэтому рендерер
+    подходит для ответов без них.
+    """
+    options = (
+        orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if orjson is not None else 0
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii
+                or not self.compact or self.get_indent(
+                    accepted_media_type, renderer_context or {}
+                ) is not None):
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        return orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            option=self.options
+        ).replace(
+            b'\xe2\x80\xa8', b'\\u2028'
+        ).replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -1,16 +1,54 @@
+from django.db import transaction
 from djoser.serializers import UserSerializer as DjoserUserSerializer
 from drf_extra_fields.fields import Base64ImageField
-from rest_framework.serializers import (CharField, IntegerField,
+from rest_framework.serializers import (CharField, IntegerField, ListField,
                                         ModelSerializer,
-                                        PrimaryKeyRelatedField,
+                                        PrimaryKeyRelatedField, Serializer,
                                         SerializerMethodField, ValidationError)
 
 from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
                             ShoppingCart, Tag)
-from users.models import Subscription, User
+from recipes.services import schedule_recipe_shopping_list_rebuild
+from users.models import User
+from .cache import invalidate_recipes
+from .utils import get_recipes_limit, get_subscribed_ids
 
 
-class UserSerializer(DjoserUserSerializer):
+def does_not_exist_message(pk):
+    """Текст ошибки PrimaryKeyRelatedField для несуществующего id."""
+    return PrimaryKeyRelatedField.default_error_messages[
+        'does_not_exist'
+    ].format(pk_value=pk)
+
+
+class PrimaryKeyField(IntegerField):
+    """Целочисленный id с ошибками как у PrimaryKeyRelatedField.
+
+    Объекты по таким id загружаются пачкой при валидации серилизатора.
+    """
+
+    def to_internal_value(self, data):
+        try:
+            return super().to_internal_value(data)
+        except ValidationError:
+            raise ValidationError(
+                PrimaryKeyRelatedField.default_error_messages[
+                    'incorrect_type'
+                ].format(data_type=type(data).__name__)
+            )
+
+
+class SparseSerializerMixin:
+    """Оставляет в серилизаторе только поля из аргумента fields."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class UserSerializer(SparseSerializerMixin, DjoserUserSerializer):
     """Серилизатор пользователя."""
     is_subscribed = SerializerMethodField(
         read_only=True,
@@ -47,12 +85,7 @@ class UserSerializer(DjoserUserSerializer):
         return user
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        if request.user.is_anonymous:
-            return False
-        return Subscription.objects.filter(
-            following=request.user,
-            follower=obj).exists()
+        return obj.id in get_subscribed_ids(self.context.get('request'))
 
 
 class TagSerializer(ModelSerializer):
@@ -68,6 +101,12 @@ class IngredientSerializer(ModelSerializer):
         model = Ingredient
         fields = '__all__'
 
+    def validate_name(self, value):
+        return value.lower()
+
+    def validate_measurement_unit(self, value):
+        return value.lower()
+
 
 class IngredientRecipeSerializer(ModelSerializer):
     """Серилизатор для меры измерения ингредиента."""
@@ -91,7 +130,7 @@ class IngredientRecipeSerializer(ModelSerializer):
 
 class IngredientAmountSerializer(ModelSerializer):
     """Серилизатор для добавления количества ингредиента."""
-    id = PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = PrimaryKeyField()
     amount = IntegerField()
 
     class Meta:
@@ -99,7 +138,7 @@ class IngredientAmountSerializer(ModelSerializer):
         fields = ['id', 'amount']
 
 
-class RecipeSerializer(ModelSerializer):
+class RecipeSerializer(SparseSerializerMixin, ModelSerializer):
     """Серилизатор вывода рецепта."""
     tags = TagSerializer(
         read_only=True,
@@ -124,15 +163,24 @@ class RecipeSerializer(ModelSerializer):
 
     class Meta:
         model = Recipe
-        fields = '__all__'
+        exclude = (
+            'favorites_count',
+            'carts_count',
+            'search_ingredients',
+            'search_vector',
+        )
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if request.user.is_anonymous:
             return False
         return Favorite.objects.filter(user=request.user, recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if request.user.is_anonymous:
             return False
@@ -155,11 +203,19 @@ class ShoppingCartSerializer(ModelSerializer):
         )
 
 
+class RecipeIdsSerializer(Serializer):
+    """Серилизатор списка id рецептов для массовых операций."""
+    recipes = ListField(
+        child=IntegerField(),
+        allow_empty=False,
+        max_length=100
+    )
+
+
 class CreateRecipeSerializer(ModelSerializer):
     """Серилизатор создания рецепта."""
-    tags = PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True
+    tags = ListField(
+        child=PrimaryKeyField()
     )
     author = UserSerializer(read_only=True)
     ingredients = IngredientAmountSerializer(many=True)
@@ -180,7 +236,7 @@ class CreateRecipeSerializer(ModelSerializer):
         )
 
     def validate_ingredients(self, data):
-        all_ingredients = []
+        all_ingredients = set()
         for ingredient in data:
             if int(ingredient['amount']) < 1:
                 raise ValidationError(
@@ -190,19 +246,34 @@ class CreateRecipeSerializer(ModelSerializer):
                 raise ValidationError(
                     {'ingredient': 'Ингредиенты должны быть уникальными'}
                 )
-            all_ingredients.append(ingredient['id'])
+            all_ingredients.add(ingredient['id'])
         if not all_ingredients:
             raise ValidationError(
                 {'ingredient': 'Требуется хотя бы 1 ингредиент'}
             )
-        return data
+        objects = Ingredient.objects.in_bulk(all_ingredients)
+        errors = [
+            {} if ingredient['id'] in objects
+            else {'id': [does_not_exist_message(ingredient['id'])]}
+            for ingredient in data
+        ]
+        if any(errors):
+            raise ValidationError(errors)
+        return [
+            dict(ingredient, id=objects[ingredient['id']])
+            for ingredient in data
+        ]
 
     def validate_tags(self, data):
         if not data:
             raise ValidationError(
                 {'tags': 'Требуется хотя бы 1 тэг'}
             )
-        return data
+        objects = Tag.objects.in_bulk(data)
+        for pk in data:
+            if pk not in objects:
+                raise ValidationError(does_not_exist_message(pk))
+        return [objects[pk] for pk in data]
 
     def validate_cooking_time(self, data):
         if data < 1:
@@ -221,39 +292,76 @@ class CreateRecipeSerializer(ModelSerializer):
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        recipe = Recipe.objects.create(**validated_data)
-        recipe.tags.set(tags)
-        self.create_ingredients(
-            recipe=recipe,
-            ingredients=ingredients
-        )
+        with transaction.atomic():
+            recipe = Recipe.objects.create(**validated_data)
+            recipe.tags.set(tags)
+            self.create_ingredients(
+                recipe=recipe,
+                ingredients=ingredients
+            )
         return recipe
 
+    def update_ingredients(self, ingredients, recipe):
+        """Меняет только отличающиеся строки ингредиентов рецепта.
+
+        Возвращает True, если состав рецепта изменился.
+        """
+        existing = {
+            ingredient_recipe.ingredient_id: ingredient_recipe
+            for ingredient_recipe in IngredientRecipe.objects.filter(
+                recipe=recipe
+            )
+        }
+        wanted = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        to_delete = existing.keys() - wanted.keys()
+        to_update = []
+        for ingredient_id, ingredient_recipe in existing.items():
+            amount = wanted.get(ingredient_id)
+            if amount is not None and ingredient_recipe.amount != amount:
+                ingredient_recipe.amount = amount
+                to_update.append(ingredient_recipe)
+        to_create = [
+            IngredientRecipe(
+                ingredient_id=ingredient_id,
+                recipe=recipe,
+                amount=amount
+            ) for ingredient_id, amount in wanted.items()
+            if ingredient_id not in existing
+        ]
+        if to_delete:
+            IngredientRecipe.objects.filter(
+                recipe=recipe,
+                ingredient_id__in=to_delete
+            ).delete()
+        if to_update:
+            IngredientRecipe.objects.bulk_update(to_update, ['amount'])
+        if to_create:
+            IngredientRecipe.objects.bulk_create(to_create)
+        return bool(to_delete or to_update or to_create)
+
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        instance = super().update(instance, validated_data)
-        instance.tags.clear()
-        instance.tags.set(tags)
-        instance.ingredients.clear()
-        self.create_ingredients(
-            recipe=instance,
-            ingredients=ingredients
-        )
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            instance.tags.set(tags)
+            if self.update_ingredients(ingredients, instance):
+                schedule_recipe_shopping_list_rebuild([instance.id])
+                invalidate_recipes([instance.id])
         return instance
 
     def to_representation(self, instance):
-        request = self.context.get('request')
-        context = {'request': request}
         return RecipeSerializer(
             instance,
-            context=context).data
+            context=self.context).data
 
 
 class SubscriptionSerializer(UserSerializer):
     """Серилизатор подписок."""
-    recipes = ShoppingCartSerializer(
-        many=True,
+    recipes = SerializerMethodField(
         read_only=True
     )
     recipes_count = SerializerMethodField(
@@ -273,5 +381,18 @@ class SubscriptionSerializer(UserSerializer):
             'recipes_count'
         ]
 
+    def get_recipes(self, obj):
+        recipes = getattr(obj, 'recent_recipes', None)
+        if recipes is None:
+            recipes = obj.recipes.all()
+            limit = get_recipes_limit(self.context.get('request'))
+            if limit:
+                recipes = recipes[:limit]
+        return ShoppingCartSerializer(
+            recipes,
+            many=True,
+            context=self.context
+        ).data
+
     def get_recipes_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
@@ -0,0 +1,316 @@
+import csv
+import json
+import logging
+import struct
+import zlib
+from functools import lru_cache
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TITLE = 'Список покупок:'
+
+PDF_PAGE_WIDTH = 595
+PDF_PAGE_HEIGHT = 842
+PDF_MARGIN = 56
+PDF_FONT_SIZE = 12
+PDF_LEADING = 18
+PDF_LINES_PER_PAGE = (PDF_PAGE_HEIGHT - 2 * PDF_MARGIN) // PDF_LEADING
+PDF_CYRILLIC_GLYPHS = (
+    ('АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ', 10017),
+    ('абвгдеёжзийклмнопрстуфхцчшщъыьэюя', 10065),
+)
+
+
+def format_line(item):
+    return (f'    ·{item["ingredient__name"]} — '
+            f'{item["amount"]}'
+            f' {item["ingredient__measurement_unit"]}')
+
+
+def render_txt(items):
+    """Построчная выгрузка в текстовом формате."""
+    yield TITLE
+    for item in items:
+        yield '\n' + format_line(item)
+
+
+class Echo:
+    """Буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(items):
+    """Построчная выгрузка в формате CSV."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'amount', 'measurement_unit'))
+    for item in items:
+        yield writer.writerow((
+            item['ingredient__name'],
+            item['amount'],
+            item['ingredient__measurement_unit'],
+        ))
+
+
+def render_json(items):
+    """Поэлементная выгрузка в формате JSON."""
+    yield '['
+    separator = ''
+    for item in items:
+        yield separator + json.dumps({
+            'name': item['ingredient__name'],
+            'amount': item['amount'],
+            'measurement_unit': item['ingredient__measurement_unit'],
+        }, ensure_ascii=False)
+        separator = ','
+    yield ']'
+
+
+def pdf_font_differences():
+    """Имена глифов кириллицы для кодировки cp1251."""
+    differences = []
+    for letters, first_glyph in PDF_CYRILLIC_GLYPHS:
+        for number, letter in enumerate(letters, first_glyph):
+            differences.append(
+                f'{letter.encode("cp1251")[0]} /afii{number}'
+            )
+    return ' '.join(differences)
+
+
+def pdf_encoding_chars():
+    """Символы, которые кодировка шрифта ставит на коды 32–255."""
+    chars = {
+        code: bytes((code, )).decode('cp1252', errors='ignore')
+        for code in range(32, 256)
+    }
+    for letters, _ in PDF_CYRILLIC_GLYPHS:
+        for letter in letters:
+            chars[letter.encode('cp1251')[0]] = letter
+    return chars
+
+
+def read_truetype(data):
+    """Метрики TrueType-шрифта, нужные для встраивания в PDF.
+
+    Из таблиц head, hhea, hmtx и cmap (формат 4) берутся размер em,
+    габариты, подъём и спуск, а также ширины символов кодировки.
+    """
+    tables = {}
+    for index in range(struct.unpack('>H', data[4:6])[0]):
+        tag, _, offset, _ = struct.unpack(
+            '>4sIII', data[12 + 16 * index:28 + 16 * index]
+        )
+        tables[tag] = offset
+    head, hhea = tables[b'head'], tables[b'hhea']
+    units = struct.unpack('>H', data[head + 18:head + 20])[0]
+    bbox = struct.unpack('>4h', data[head + 36:head + 44])
+    ascent, descent = struct.unpack('>2h', data[hhea + 4:hhea + 8])
+    metrics_count = struct.unpack('>H', data[hhea + 34:hhea + 36])[0]
+    glyphs = read_cmap(data, tables[b'cmap'])
+
+    def width(char):
+        glyph = min(glyphs(ord(char)), metrics_count - 1) if char else 0
+        advance = struct.unpack(
+            '>H', data[tables[b'hmtx'] + 4 * glyph:][:2]
+        )[0]
+        return round(advance * 1000 / units) if char else 0
+
+    def scale(value):
+        return round(value * 1000 / units)
+
+    return {
+        'bbox': [scale(value) for value in bbox],
+        'ascent': scale(ascent),
+        'descent': scale(descent),
+        'widths': [
+            width(char) for _, char in sorted(pdf_encoding_chars().items())
+        ],
+    }
+
+
+def read_cmap(data, cmap):
+    """Функция символ -> глиф по таблице cmap формата 4 для Unicode."""
+    for index in range(struct.unpack('>H', data[cmap + 2:cmap + 4])[0]):
+        platform, encoding, offset = struct.unpack(
+            '>HHI', data[cmap + 4 + 8 * index:cmap + 12 + 8 * index]
+        )
+        table = cmap + offset
+        if ((platform, encoding) in ((3, 1), (0, 3))
+                and struct.unpack('>H', data[table:table + 2])[0] == 4):
+            break
+    else:
+        raise ValueError('В шрифте нет таблицы cmap формата 4')
+    count = struct.unpack('>H', data[table + 6:table + 8])[0] // 2
+    ends = table + 14
+    starts = ends + 2 * count + 2
+    deltas = starts + 2 * count
+    range_offsets = deltas + 2 * count
+
+    def glyph(code):
+        for segment in range(count):
+            end, start, delta, range_offset = (
+                struct.unpack('>H', data[array + 2 * segment:][:2])[0]
+                for array in (ends, starts, deltas, range_offsets)
+            )
+            if code > end:
+                continue
+            if code < start:
+                return 0
+            if not range_offset:
+                return (code + delta) & 0xFFFF
+            position = (range_offsets + 2 * segment + range_offset
+                        + 2 * (code - start))
+            index = struct.unpack('>H', data[position:position + 2])[0]
+            return (index + delta) & 0xFFFF if index else 0
+        return 0
+
+    return glyph
+
+
+@lru_cache(maxsize=None)
+def load_pdf_font(path):
+    """Сжатый файл шрифта и его метрики или None, если шрифт не прочитан."""
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+        return zlib.compress(data), len(data), read_truetype(data)
+    except (OSError, KeyError, ValueError, struct.error) as error:
+        logger.warning('Шрифт %s для PDF не загружен: %s', path, error)
+        return None
+
+
+def pdf_font_objects():
+    """Объекты шрифта PDF начиная с номера 3.
+
+    С настройкой SHOPPING_LIST_PDF_FONT TrueType-шрифт встраивается в
+    документ. Без неё используется стандартный Helvetica с именами
+    глифов кириллицы: он не встроен, и часть программ просмотра
+    показывает вместо русских названий пустые места.
+    """
+    encoding = (
+        '/Encoding << /Type /Encoding /BaseEncoding /WinAnsiEncoding '
+        f'/Differences [{pdf_font_differences()}] >>'
+    )
+    path = getattr(settings, 'SHOPPING_LIST_PDF_FONT', None)
+    font = load_pdf_font(path) if path else None
+    if font is None:
+        return [
+            f'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+            f'{encoding} >>'.encode()
+        ]
+    compressed, length, metrics = font
+    return [
+        (
+            '<< /Type /Font /Subtype /TrueType /BaseFont /ShoppingListFont '
+            f'/FirstChar 32 /LastChar 255 '
+            f'/Widths [{" ".join(map(str, metrics["widths"]))}] '
+            f'/FontDescriptor 4 0 R {encoding} >>'
+        ).encode(),
+        (
+            '<< /Type /FontDescriptor /FontName /ShoppingListFont '
+            f'/Flags 32 /FontBBox [{" ".join(map(str, metrics["bbox"]))}] '
+            f'/ItalicAngle 0 /Ascent {metrics["ascent"]} '
+            f'/Descent {metrics["descent"]} /CapHeight {metrics["ascent"]} '
+            '/StemV 80 /FontFile2 5 0 R >>'
+        ).encode(),
+        (
+            f'<< /Length {len(compressed)} /Length1 {length} '
+            '/Filter /FlateDecode >>\nstream\n'
+        ).encode() + compressed + b'\nendstream',
+    ]
+
+
+def pdf_text(line):
+    text = line.encode('cp1251', errors='replace')
+    for char in (b'\\', b'(', b')'):
+        text = text.replace(char, b'\\' + char)
+    return text
+
+
+def pdf_page_content(lines):
+    content = [
+        b'BT',
+        f'/F1 {PDF_FONT_SIZE} Tf {PDF_LEADING} TL'.encode(),
+        f'{PDF_MARGIN} {PDF_PAGE_HEIGHT - PDF_MARGIN} Td'.encode(),
+    ]
+    for line in lines:
+        content.append(b'(' + pdf_text(line) + b') Tj T*')
+    content.append(b'ET')
+    return b'\n'.join(content)
+
+
+def pdf_pages(items):
+    lines = [TITLE]
+    for item in items:
+        lines.append(format_line(item).strip())
+        if len(lines) == PDF_LINES_PER_PAGE:
+            yield lines
+            lines = []
+    if lines:
+        yield lines
+
+
+def render_pdf(items):
+    """Постраничная выгрузка в PDF без сторонних библиотек.
+
+    Объект Pages пишется последним, когда известны все страницы,
+    поэтому документ отдаётся по мере построения страниц. Про шрифт
+    см. pdf_font_objects.
+    """
+    offsets = {}
+    position = 0
+
+    def write_object(number, body):
+        nonlocal position
+        offsets[number] = position
+        chunk = f'{number} 0 obj\n'.encode() + body + b'\nendobj\n'
+        position += len(chunk)
+        return chunk
+
+    header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    position += len(header)
+    yield header
+    yield write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+    number = 3
+    for body in pdf_font_objects():
+        yield write_object(number, body)
+        number += 1
+    kids = []
+    for lines in pdf_pages(items):
+        content = pdf_page_content(lines)
+        yield write_object(
+            number,
+            f'<< /Length {len(content)} >>\nstream\n'.encode()
+            + content + b'\nendstream'
+        )
+        yield write_object(number + 1, (
+            f'<< /Type /Page /Parent 2 0 R '
+            f'/MediaBox [0 0 {PDF_PAGE_WIDTH} {PDF_PAGE_HEIGHT}] '
+            f'/Resources << /Font << /F1 3 0 R >> >> '
+            f'/Contents {number} 0 R >>'
+        ).encode())
+        kids.append(f'{number + 1} 0 R')
+        number += 2
+    yield write_object(2, (
+        f'<< /Type /Pages /Kids [{" ".join(kids)}] '
+        f'/Count {len(kids)} >>'
+    ).encode())
+    xref = [f'xref\n0 {number}\n', '0000000000 65535 f \n']
+    for object_number in range(1, number):
+        xref.append(f'{offsets[object_number]:010d} 00000 n \n')
+    yield ''.join(xref).encode()
+    yield (
+        f'trailer\n<< /Size {number} /Root 1 0 R >>\n'
+        f'startxref\n{position}\n%%EOF\n'
+    ).encode()
+
+
+EXPORTERS = {
+    'txt': (render_txt, 'text/plain; charset=utf-8'),
+    'csv': (render_csv, 'text/csv; charset=utf-8'),
+    'json': (render_json, 'application/json; charset=utf-8'),
+    'pdf': (render_pdf, 'application/pdf'),
+}
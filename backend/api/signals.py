@@ -0,0 +1,110 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Tag)
+from recipes.services import in_bulk_marks
+from recipes.signals import data_generated, ingredients_loaded
+from users.models import Subscription
+from .authentication import invalidate_tokens
+from .cache import bump_versions, invalidate_recipes, invalidate_user_marks
+
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    invalidate_tokens([instance.key])
+
+
+@receiver((post_save, post_delete), sender=get_user_model())
+def user_changed(sender, instance, **kwargs):
+    invalidate_tokens(
+        Token.objects.filter(user_id=instance.id).values_list('key', flat=True)
+    )
+
+
+@receiver(pre_save, sender=get_user_model())
+def author_before_save(sender, instance, update_fields, **kwargs):
+    """Запоминает, меняются ли поля автора, встроенные в рецепты."""
+    if instance._state.adding or (
+            update_fields is not None
+            and not set(update_fields) & set(AUTHOR_FIELDS)):
+        instance._author_changed = False
+        return
+    instance._author_changed = sender.objects.filter(
+        pk=instance.pk
+    ).values_list(*AUTHOR_FIELDS).first() != tuple(
+        getattr(instance, field) for field in AUTHOR_FIELDS
+    )
+
+
+@receiver(post_save, sender=get_user_model())
+def author_saved(sender, instance, update_fields, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    namespaces = [f'user:{instance.id}']
+    if getattr(instance, '_author_changed', True):
+        namespaces.append('users')
+    bump_versions(*namespaces)
+
+
+@receiver(post_delete, sender=get_user_model())
+def author_deleted(sender, instance, **kwargs):
+    bump_versions('users', f'user:{instance.id}')
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def user_recipe_state_changed(sender, instance, **kwargs):
+    if in_bulk_marks():
+        return
+    invalidate_user_marks(instance.user_id, favorites=sender is Favorite)
+
+
+@receiver((post_save, post_delete), sender=Subscription)
+def subscription_changed(sender, instance, **kwargs):
+    bump_versions(f'user_state:{instance.following_id}')
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(sender, **kwargs):
+    bump_versions('tags', 'recipes')
+
+
+@receiver(ingredients_loaded)
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    bump_versions('ingredients', 'recipes')
+
+
+@receiver(data_generated)
+def data_generated_handler(sender, **kwargs):
+    bump_versions(
+        'tags', 'ingredients', 'recipes', 'recipe_list', 'users', 'popular'
+    )
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    invalidate_recipes([instance.id])
+
+
+@receiver((post_save, post_delete), sender=IngredientRecipe)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    invalidate_recipes([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_recipes([instance.id])
+    elif pk_set:
+        invalidate_recipes(pk_set)
+    else:
+        bump_versions('recipes', 'recipe_list')
@@ -0,0 +1,76 @@
+from functools import lru_cache
+
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+@lru_cache(maxsize=None)
+def get_readable_fields(serializer_class):
+    """Имена полей, которые серилизатор отдаёт в ответе, по порядку."""
+    return tuple(
+        name for name, field in serializer_class().fields.items()
+        if not field.write_only
+    )
+
+
+def parse_fields(request, param):
+    return {
+        name.strip()
+        for value in request.query_params.getlist(param)
+        for name in value.split(',') if name.strip()
+    }
+
+
+def get_sparse_fields(request, serializer_class):
+    """Поля ответа по параметрам fields и omit или None без них.
+
+    Поля возвращаются в порядке серилизатора, неизвестные имена
+    приводят к ошибке валидации.
+    """
+    if (FIELDS_PARAM not in request.query_params
+            and OMIT_PARAM not in request.query_params):
+        return None
+    available = get_readable_fields(serializer_class)
+    requested = parse_fields(request, FIELDS_PARAM) or set(available)
+    omitted = parse_fields(request, OMIT_PARAM)
+    unknown = (requested | omitted) - set(available)
+    if unknown:
+        raise ValidationError({
+            FIELDS_PARAM: [f'Неизвестные поля: {", ".join(sorted(unknown))}']
+        })
+    return tuple(
+        name for name in available
+        if name in requested and name not in omitted
+    )
+
+
+class SparseFieldsMixin:
+    """Выбор полей ответа параметрами ?fields= и ?omit=.
+
+    Поля передаются серилизатору аргументом fields, а get_queryset
+    вьюсета может по sparse_fields не загружать лишние столбцы и
+    связанные объекты.
+    """
+    sparse_actions = ('list', 'retrieve')
+
+    def get_sparse_serializer_class(self):
+        return self.get_serializer_class()
+
+    @property
+    def sparse_fields(self):
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = (
+                get_sparse_fields(
+                    self.request, self.get_sparse_serializer_class()
+                )
+                if self.action in self.sparse_actions
+                and self.request.method == 'GET' else None
+            )
+        return self._sparse_fields
+
+    def get_serializer(self, *args, **kwargs):
+        if self.sparse_fields is not None:
+            kwargs.setdefault('fields', self.sparse_fields)
+        return super().get_serializer(*args, **kwargs)
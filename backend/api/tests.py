@@ -0,0 +1,355 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.autocomplete import ingredient_index
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from recipes.search import update_search_documents
+from users.models import Subscription, User
+from .metrics import view_metrics
+from .serializers import CreateRecipeSerializer
+from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+
+
+class RecipeDataMixin:
+    """Набор рецептов с тэгами, ингредиентами и подписками."""
+    recipes_count = 200
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                email=f'user{number}@test.ru',
+                username=f'user{number}',
+                first_name='Имя',
+                last_name='Фамилия',
+                password='password-123'
+            ) for number in range(3)
+        ]
+        cls.user = cls.users[0]
+        Subscription.objects.create(following=cls.user, follower=cls.users[1])
+        Tag.objects.bulk_create([
+            Tag(name=f'Тэг {number}', color=f'#00000{number}',
+                slug=f'tag{number}')
+            for number in range(3)
+        ])
+        cls.tags = list(Tag.objects.order_by('id'))
+        Ingredient.objects.bulk_create([
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(5)
+        ])
+        cls.ingredients = list(Ingredient.objects.order_by('id'))
+        Recipe.objects.bulk_create([
+            Recipe(
+                author=cls.users[number % 3],
+                name=f'Рецепт {number}',
+                text='Описание',
+                cooking_time=10,
+                image='recipes/images/test.png'
+            ) for number in range(cls.recipes_count)
+        ])
+        cls.recipes = list(Recipe.objects.order_by('id'))
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for number, recipe in enumerate(cls.recipes)
+            for tag in cls.tags[:number % 3 + 1]
+        ])
+        IngredientRecipe.objects.bulk_create([
+            IngredientRecipe(recipe=recipe, ingredient=ingredient, amount=5)
+            for number, recipe in enumerate(cls.recipes)
+            for ingredient in cls.ingredients[:number % 5 + 1]
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.guest = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class RecipeQueryCountTest(RecipeDataMixin, TestCase):
+    """Число запросов к базе не зависит от размера страницы."""
+
+    def test_list_query_count(self):
+        # COUNT, рецепты, тэги, ингредиенты и для пользователя подписки.
+        for fast_read in (True, False):
+            for limit in (6, 50, 200):
+                for client, queries in ((self.guest, 4), (self.client, 5)):
+                    with self.subTest(fast_read=fast_read, limit=limit,
+                                      queries=queries):
+                        cache.clear()
+                        with override_settings(API_FAST_READ=fast_read):
+                            with self.assertNumQueries(queries):
+                                response = client.get(
+                                    f'/api/recipes/?limit={limit}'
+                                )
+                        self.assertEqual(response.status_code, 200)
+                        self.assertEqual(
+                            len(response.data['results']), limit
+                        )
+
+    def test_retrieve_query_count(self):
+        # Рецепт, тэги, ингредиенты и для пользователя подписки, а с
+        # кэшем ещё отметки пользователя.
+        for shared_cache, extra in ((True, 1), (False, 0)):
+            for client, queries in ((self.guest, 3), (self.client, 4)):
+                with self.subTest(shared_cache=shared_cache,
+                                  queries=queries + extra):
+                    cache.clear()
+                    with override_settings(API_CACHE_LOCAL=shared_cache):
+                        with self.assertNumQueries(queries + extra):
+                            response = client.get(
+                                f'/api/recipes/{self.recipes[0].id}/'
+                            )
+                    self.assertEqual(response.status_code, 200)
+
+
+class RecipeCounterTest(RecipeDataMixin, TestCase):
+    """Счётчики не затираются сохранением и работают в пагинации."""
+
+    def test_full_save_keeps_counters(self):
+        recipe = Recipe.objects.get(pk=self.recipes[0].id)
+        author = User.objects.get(pk=self.users[2].id)
+        response = self.client.post(f'/api/recipes/{recipe.id}/favorite/')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post(f'/api/users/{author.id}/subscribe/')
+        self.assertEqual(response.status_code, 201)
+        recipe.name = 'Новое название'
+        recipe.save()
+        author.first_name = 'Новое имя'
+        author.save()
+        recipe.refresh_from_db()
+        author.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(author.followers_count, 1)
+        self.assertEqual(author.first_name, 'Новое имя')
+
+    def test_popular_ordering_ignores_cursor(self):
+        popular = self.recipes[-1]
+        self.client.post(f'/api/recipes/{popular.id}/favorite/')
+        response = self.guest.get(
+            '/api/recipes/?pagination=cursor&ordering=popular&limit=2'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], len(self.recipes))
+        self.assertEqual(response.data['results'][0]['id'], popular.id)
+        next_page = self.guest.get(response.data['next'])
+        self.assertEqual(
+            [recipe['id'] for recipe in next_page.data['results']],
+            [self.recipes[-3].id, self.recipes[-4].id]
+        )
+
+
+class UpdateIngredientsTest(RecipeDataMixin, TestCase):
+    """Правка рецепта меняет только отличающиеся строки ингредиентов."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.recipes[4]
+        self.serializer = CreateRecipeSerializer()
+
+    def get_rows(self):
+        return dict(
+            IngredientRecipe.objects.filter(
+                recipe=self.recipe
+            ).values_list('id', 'amount')
+        )
+
+    def get_ingredients(self, **amounts):
+        return [
+            {'id': ingredient, 'amount': amounts.get(ingredient.name, 5)}
+            for ingredient in self.ingredients
+        ]
+
+    def test_no_op_edit(self):
+        rows = self.get_rows()
+        # Только чтение текущих строк.
+        with self.assertNumQueries(1):
+            changed = self.serializer.update_ingredients(
+                self.get_ingredients(), self.recipe
+            )
+        self.assertFalse(changed)
+        self.assertEqual(self.get_rows(), rows)
+
+    def test_single_ingredient_edit(self):
+        rows = self.get_rows()
+        edited = IngredientRecipe.objects.get(
+            recipe=self.recipe, ingredient=self.ingredients[0]
+        ).id
+        # Чтение текущих строк и одно обновление.
+        with self.assertNumQueries(2):
+            changed = self.serializer.update_ingredients(
+                self.get_ingredients(**{self.ingredients[0].name: 7}),
+                self.recipe
+            )
+        self.assertTrue(changed)
+        rows[edited] = 7
+        self.assertEqual(self.get_rows(), rows)
+
+
+class RecipeSearchTest(RecipeDataMixin, TestCase):
+    """Полнотекстовый поиск сочетается с фильтрами и счётчиками тэгов."""
+
+    def setUp(self):
+        super().setUp()
+        update_search_documents(recipe.id for recipe in self.recipes)
+
+    def test_search_with_facets(self):
+        response = self.guest.get(
+            f'/api/recipes/?search=рецепт&tags={self.tags[2].slug}'
+            '&facets=1&limit=500'
+        )
+        self.assertEqual(response.status_code, 200)
+        found = len(self.recipes[2::3])
+        self.assertEqual(len(response.data['results']), found)
+        self.assertEqual(
+            {tag['slug']: tag['count']
+             for tag in response.data['facets']['tags']},
+            {tag.slug: found for tag in self.tags}
+        )
+
+
+@override_settings(API_CACHE_LOCAL=True)
+class RecipeETagTest(RecipeDataMixin, TestCase):
+    """ETag списка рецептов меняется только вместе с его содержимым."""
+
+    def get_etag(self):
+        return self.client.get('/api/recipes/')['ETag']
+
+    def test_login_keeps_etag(self):
+        etag = self.get_etag()
+        response = APIClient().post(
+            '/api/auth/token/login/',
+            {'email': self.users[1].email, 'password': 'password-123'}
+        )
+        self.assertEqual(response.status_code, 200)
+        User.objects.create_user(
+            email='new@test.ru', username='new', password='password-123'
+        )
+        response = self.client.get('/api/recipes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_author_name_changes_etag(self):
+        etag = self.get_etag()
+        author = User.objects.get(pk=self.users[1].id)
+        author.set_password('password-456')
+        author.save()
+        self.assertEqual(self.get_etag(), etag)
+        author.first_name = 'Новое имя'
+        author.save()
+        self.assertNotEqual(self.get_etag(), etag)
+
+
+@override_settings(
+    API_CACHE_LOCAL=True,
+    API_METRICS={'HEADERS': True, 'BUDGET_MODE': 'raise'}
+)
+class QueryBudgetTest(RecipeDataMixin, TestCase):
+    """Представления укладываются в бюджеты запросов query_budgets."""
+    view_sets = (UserViewSet, RecipeViewSet, IngredientViewSet, TagViewSet)
+
+    def setUp(self):
+        super().setUp()
+        view_metrics.reset()
+
+    def request(self, method, url, **kwargs):
+        # Отложенные on_commit пересчёты выполняются после ответа, как
+        # после фиксации транзакции запроса.
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(
+                url, format='json', **kwargs
+            )
+        self.assertLess(response.status_code, 400, url)
+        self.assertLessEqual(
+            int(response['X-Query-Count']), int(response['X-Query-Budget']),
+            url
+        )
+        self.assertLessEqual(
+            float(response['X-View-Time']) + float(response['X-Render-Time']),
+            float(response['X-Response-Time']) + 0.01,
+            url
+        )
+
+    def test_query_budgets(self):
+        author = self.users[2]
+        recipe = self.recipes[0]
+        recipe_ids = {'recipes': [recipe.id for recipe in self.recipes[1:6]]}
+        ingredient = self.ingredients[0]
+        for method, url, kwargs in (
+            ('get', '/api/users/', {}),
+            ('get', f'/api/users/{author.id}/', {}),
+            ('get', '/api/users/me/', {}),
+            ('get', '/api/users/subscriptions/', {}),
+            ('post', f'/api/users/{author.id}/subscribe/', {}),
+            ('delete', f'/api/users/{author.id}/subscribe/', {}),
+            ('get', '/api/recipes/', {}),
+            ('get', f'/api/recipes/{recipe.id}/', {}),
+            ('get', '/api/recipes/feed/', {}),
+            ('post', f'/api/recipes/{recipe.id}/favorite/', {}),
+            ('delete', f'/api/recipes/{recipe.id}/favorite/', {}),
+            ('post', f'/api/recipes/{recipe.id}/shopping_cart/', {}),
+            ('post', '/api/recipes/favorite/', {'data': recipe_ids}),
+            ('delete', '/api/recipes/favorite/', {'data': recipe_ids}),
+            ('post', '/api/recipes/shopping_cart/', {'data': recipe_ids}),
+            ('get', '/api/recipes/download_shopping_cart/', {}),
+            ('delete', '/api/recipes/shopping_cart/', {'data': recipe_ids}),
+            ('delete', f'/api/recipes/{recipe.id}/shopping_cart/', {}),
+            ('get', '/api/ingredients/', {}),
+            ('get', '/api/ingredients/?name=ингр', {}),
+            ('get', f'/api/ingredients/{ingredient.id}/', {}),
+            ('get', '/api/ingredients/autocomplete/?name=ингр', {}),
+            ('get', '/api/tags/', {}),
+            ('get', f'/api/tags/{self.tags[0].id}/', {}),
+        ):
+            with self.subTest(method=method, url=url):
+                self.request(method, url, **kwargs)
+        measured = {row['view'] for row in view_metrics.snapshot()}
+        for view_set in self.view_sets:
+            for action in view_set.query_budgets:
+                self.assertIn(f'{view_set.__name__}.{action}', measured)
+
+
+class IngredientSearchTest(TestCase):
+    """Поиск ингредиентов не зависит от регистра запроса."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email='admin@test.ru',
+            username='admin',
+            first_name='Имя',
+            last_name='Фамилия',
+            password='password-123'
+        )
+
+    def setUp(self):
+        cache.clear()
+        ingredient_index.version = None
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_created_names_are_lowercase(self):
+        response = self.client.post(
+            '/api/ingredients/',
+            {'name': 'Ликер Baileys', 'measurement_unit': 'МЛ'}
+        )
+        self.assertEqual(response.status_code, 201)
+        for query in ('Лик', 'лик'):
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/ingredients/?name={query}')
+                self.assertEqual(
+                    [ingredient['name'] for ingredient in response.data],
+                    ['ликер baileys']
+                )
+
+    def test_autocomplete_ignores_case(self):
+        Ingredient.objects.create(name='Буррата', measurement_unit='г')
+        for query in ('бур', 'БУР'):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    f'/api/ingredients/autocomplete/?name={query}'
+                )
+                self.assertEqual(
+                    [ingredient['name'] for ingredient in response.data],
+                    ['Буррата']
+                )
@@ -1,7 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import SimpleRouter
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from .views import (IngredientViewSet, MetricsView, ProfileViewSet,
+                    RecipeViewSet, TagViewSet, UserViewSet)
 
 router = SimpleRouter()
 router.register(
@@ -24,8 +25,14 @@ router.register(
     UserViewSet,
     basename='users'
 )
+router.register(
+    'profiles',
+    ProfileViewSet,
+    basename='profiles'
+)
 urlpatterns = [
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 
 ]
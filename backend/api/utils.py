@@ -0,0 +1,51 @@
+from django.conf import settings
+
+from users.models import Subscription
+
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_is_shared():
+    """Общий ли кэш Django для всех процессов приложения.
+
+    Кэш токенов, кэш ответов и ETag работают только с общим кэшем: с
+    локальным кэшем процесса инвалидация в одном воркере не видна
+    остальным, и они отдавали бы устаревшие данные. Локальный кэш
+    считается общим только с настройкой API_CACHE_LOCAL = True, когда
+    приложение работает одним процессом.
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    return (backend not in LOCAL_CACHE_BACKENDS
+            or getattr(settings, 'API_CACHE_LOCAL', False))
+
+
+def get_subscribed_ids(request):
+    """Множество id авторов, на которых подписан пользователь запроса.
+
+    Загружается одним запросом и запоминается на объекте запроса.
+    """
+    if request is None or request.user.is_anonymous:
+        return frozenset()
+    subscribed_ids = getattr(request, '_subscribed_ids', None)
+    if subscribed_ids is None:
+        subscribed_ids = frozenset(
+            Subscription.objects.filter(
+                following=request.user
+            ).values_list('follower_id', flat=True)
+        )
+        request._subscribed_ids = subscribed_ids
+    return subscribed_ids
+
+
+def get_recipes_limit(request):
+    """Значение параметра recipes_limit или None, если он не задан."""
+    if request is None:
+        return None
+    try:
+        limit = int(request.query_params.get('recipes_limit'))
+    except (TypeError, ValueError):
+        return None
+    return limit if limit > 0 else None
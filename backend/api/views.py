@@ -1,32 +1,82 @@
-from django.db.models import Sum
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
+from django.db.models import (BooleanField, Exists, OuterRef, Prefetch,
+                              Subquery, Value)
+from django.http import (FileResponse, HttpResponse, HttpResponseForbidden,
+                         StreamingHttpResponse)
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import (SAFE_METHODS, IsAdminUser,
+                                        IsAuthenticated)
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet
+from rest_framework.views import APIView
+from rest_framework.viewsets import ModelViewSet, ViewSet
 
 from api.permissions import IsAdminOrReadOnly, IsOwnerOrIsAdminOrReadOnly
+from recipes.autocomplete import ingredient_index
+from recipes.feed import filter_feed
 from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
                             ShoppingCart, Tag)
+from recipes.services import (bulk_add_marks, bulk_remove_marks,
+                              get_shopping_list, get_shopping_list_version)
 from users.models import Subscription, User
-from .filters import IngredientFilter, RecipeFilter
+from .cache import (CachedListMixin, CachedRecipeMixin, ConditionalGetMixin,
+                    conditional_response, invalidate_user_marks, make_etag)
+from .fast_read import FastRecipeListMixin, recipe_columns
+from .filters import IngredientFilter, RecipeFilter, get_tag_facets
+from .metrics import view_metrics
+from .pagination import (LimitPageNumberPagination, RecipeCursorPagination,
+                         RecipePagination)
+from .profiling import profile_store
+from .prometheus import CONTENT_TYPE, access_allowed, registry
+from .renderers import (CSVExportRenderer, FastJSONRenderer,
+                        PDFExportRenderer, TextExportRenderer)
 from .serializers import (CreateRecipeSerializer, IngredientSerializer,
-                          RecipeSerializer, ShoppingCartSerializer,
-                          SubscriptionSerializer, TagSerializer,
-                          UserSerializer)
+                          RecipeIdsSerializer, RecipeSerializer,
+                          ShoppingCartSerializer, SubscriptionSerializer,
+                          TagSerializer, UserSerializer)
+from .shopping_list import EXPORTERS
+from .sparse import SparseFieldsMixin
+from .utils import get_recipes_limit
 
 
-class UserViewSet(DjoserUserViewSet):
+class UserViewSet(SparseFieldsMixin, DjoserUserViewSet):
     """Вьюсет пользователя."""
     queryset = User.objects.all()
-    pagination_class = PageNumberPagination
+    pagination_class = LimitPageNumberPagination
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated, ]
+    sparse_actions = ('list', 'retrieve', 'me', 'subscriptions')
+    query_budgets = {
+        'list': 4,
+        'retrieve': 3,
+        'me': 2,
+        'subscriptions': 5,
+        'subscribe': 7,
+    }
+
+    def get_sparse_serializer_class(self):
+        if self.action == 'subscriptions':
+            return SubscriptionSerializer
+        return super().get_sparse_serializer_class()
+
+    def only_user_columns(self, queryset, *extra):
+        """Загружает только столбцы пользователя, нужные для ответа."""
+        fields = self.sparse_fields
+        if fields is None:
+            return queryset
+        return queryset.only('id', *(
+            name for name in (
+                'email', 'username', 'first_name', 'last_name', *extra
+            ) if name in fields
+        ))
+
+    def get_queryset(self):
+        return self.only_user_columns(super().get_queryset())
 
     @action(
         methods=['get', ],
@@ -35,11 +85,18 @@ class UserViewSet(DjoserUserViewSet):
     )
     def me(self, request):
         """Эндпоинт для получения информации о текущем пользователе."""
-        serializer = UserSerializer(
-            request.user,
-            context={'request': request}
+        return conditional_response(
+            request,
+            make_etag(
+                (f'user:{request.user.id}', ),
+                f'{request.user.id}:{self.sparse_fields}'
+            ),
+            lambda: Response(UserSerializer(
+                request.user,
+                context={'request': request},
+                fields=self.sparse_fields
+            ).data)
         )
-        return Response(serializer.data)
 
     def add_obj(self, author, id):
         """Подписка на пользователя по id."""
@@ -97,33 +154,131 @@ class UserViewSet(DjoserUserViewSet):
     )
     def subscriptions(self, request):
         """Эндпоинт для получения списка подписок."""
-        users = User.objects.filter(follower__following=request.user)
+        recipes = Recipe.objects.all()
+        limit = get_recipes_limit(request)
+        if limit:
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).order_by('-pub_date', '-id').values('pk')[:limit]
+            ))
+        users = self.only_user_columns(
+            User.objects.filter(follower__following=request.user),
+            'recipes_count'
+        ).order_by('id')
+        if self.sparse_fields is None or 'recipes' in self.sparse_fields:
+            users = users.prefetch_related(Prefetch(
+                'recipes', queryset=recipes, to_attr='recent_recipes'
+            ))
         pages = self.paginate_queryset(users)
 
         serializer = SubscriptionSerializer(
             pages,
             context={'request': self.request},
-            many=True
+            many=True,
+            fields=self.sparse_fields
         )
         return self.get_paginated_response(serializer.data)
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, CachedRecipeMixin,
+                    FastRecipeListMixin, ModelViewSet):
     """Вьюсет для рецепта."""
     queryset = Recipe.objects.all()
+    renderer_classes = (FastJSONRenderer, BrowsableAPIRenderer)
     permission_classes = (IsOwnerOrIsAdminOrReadOnly, )
-    pagination_class = PageNumberPagination
-    pagination_class.page_size_query_param = 'limit'
-    pagination_class.page_size = 6
+    pagination_class = RecipePagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
+    query_budgets = {
+        'list': 8,
+        'retrieve': 6,
+        'feed': 6,
+        'favorite': 8,
+        'shopping_cart': 10,
+        'favorite_bulk': 8,
+        'shopping_cart_bulk': 10,
+        'download_shopping_cart': 5,
+    }
+    sparse_actions = ('list', 'retrieve', 'feed')
+
+    def get_recipes(self):
+        """Рецепты только со столбцами и связями, нужными для ответа."""
+        fields = self.sparse_fields
+        if fields is None:
+            queryset = Recipe.objects.defer(
+                'search_ingredients', 'search_vector'
+            )
+        else:
+            queryset = Recipe.objects.only(*recipe_columns(fields))
+        if fields is None or 'author' in fields:
+            queryset = queryset.select_related('author')
+        prefetches = []
+        if fields is None or 'tags' in fields:
+            prefetches.append(
+                Prefetch('tags', queryset=Tag.objects.order_by('id'))
+            )
+        if fields is None or 'ingredients' in fields:
+            prefetches.append(Prefetch(
+                'recipe',
+                queryset=IngredientRecipe.objects.select_related(
+                    'ingredient'
+                ).order_by('id')
+            ))
+        return queryset.prefetch_related(*prefetches)
+
+    def get_queryset(self):
+        """Рецепты с отметками избранного и корзины текущего пользователя.
+
+        При ?fields= или ?omit= добавляются только запрошенные отметки.
+        """
+        user = self.request.user
+        flags = {}
+        for name, model in (('is_favorited', Favorite),
+                            ('is_in_shopping_cart', ShoppingCart)):
+            if (self.sparse_fields is not None
+                    and name not in self.sparse_fields):
+                continue
+            flags[name] = (
+                Value(False, output_field=BooleanField())
+                if user.is_anonymous
+                else Exists(model.objects.filter(
+                    user=user,
+                    recipe=OuterRef('pk')
+                ))
+            )
+        return self.get_recipes().annotate(**flags)
+
+    def get_etag_namespaces(self, request):
+        namespaces = ['recipes', 'users', f'user_state:{request.user.id}']
+        if request.query_params.get('ordering') == 'popular':
+            namespaces.append('popular')
+        if self.action == 'retrieve':
+            namespaces.append(f'recipe:{self.kwargs["pk"]}')
+        else:
+            namespaces.append('recipe_list')
+        return namespaces
+
+    def get_cache_suffix(self, request):
+        return f'{super().get_cache_suffix(request)}:{self.sparse_fields}'
+
+    def list(self, request, *args, **kwargs):
+        """Список рецептов, с параметром facets=1 — и счётчики по тэгам."""
+        response = super().list(request, *args, **kwargs)
+        if (response.status_code == status.HTTP_200_OK
+                and request.query_params.get('facets') == '1'
+                and isinstance(response.data, dict)):
+            response.data['facets'] = {'tags': get_tag_facets(
+                self.filter_queryset(self.get_queryset())
+            )}
+        return response
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
     def get_serializer_class(self):
         """Выбор серилизатора в зависимости от метода."""
-        if self.request in SAFE_METHODS:
+        if self.request.method in SAFE_METHODS:
             return RecipeSerializer
         return CreateRecipeSerializer
 
@@ -150,6 +305,62 @@ class RecipeViewSet(ModelViewSet):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    @action(
+        detail=False,
+        methods=['get', ],
+        permission_classes=[IsAuthenticated, ],
+        pagination_class=RecipeCursorPagination
+    )
+    def feed(self, request):
+        """Эндпоинт ленты рецептов авторов из подписок пользователя."""
+        return self.fast_list(filter_feed(
+            self.filter_queryset(self.get_queryset()),
+            request.user
+        ))
+
+    def bulk_obj(self, obj, request):
+        """Массовое добавление или удаление рецептов из списка."""
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        if request.method == 'POST':
+            added, existing, missing = bulk_add_marks(
+                obj, request.user, recipe_ids)
+            statuses = {'added': added, 'exists': existing,
+                        'not_found': missing}
+        else:
+            removed, missing = bulk_remove_marks(
+                obj, request.user, recipe_ids)
+            statuses = {'removed': removed, 'not_found': missing}
+        invalidate_user_marks(request.user.id, favorites=obj is Favorite)
+        result = {}
+        for name, ids in statuses.items():
+            result.update(dict.fromkeys(ids, name))
+        return Response([
+            {'id': recipe_id, 'status': result[recipe_id]}
+            for recipe_id in dict.fromkeys(recipe_ids)
+        ])
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        permission_classes=[IsAuthenticated, ],
+        url_path='shopping_cart'
+    )
+    def shopping_cart_bulk(self, request):
+        """Эндпоинт для добавления или удаления нескольких рецептов корзины."""
+        return self.bulk_obj(ShoppingCart, request)
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        permission_classes=[IsAuthenticated, ],
+        url_path='favorite'
+    )
+    def favorite_bulk(self, request):
+        """Эндпоинт для добавления или удаления нескольких избранных."""
+        return self.bulk_obj(Favorite, request)
+
     @action(
         detail=True,
         methods=['post', 'delete'],
@@ -176,50 +387,131 @@ class RecipeViewSet(ModelViewSet):
     @action(
         detail=False,
         methods=['get', ],
-        permission_classes=[IsAuthenticated, ]
+        permission_classes=[IsAuthenticated, ],
+        renderer_classes=[
+            TextExportRenderer,
+            CSVExportRenderer,
+            JSONRenderer,
+            PDFExportRenderer,
+        ]
     )
     def download_shopping_cart(self, request):
-        """Эндпоинт для скачивания ингредиентов из корзины."""
+        """Эндпоинт для скачивания ингредиентов из корзины.
+
+        Формат выбирается параметром format: txt, csv, json или pdf.
+        """
         user = request.user
         if not user.carts.exists():
             return Response(
                 {'errors': 'У вас нет списка покупок'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        ingredients = IngredientRecipe.objects.filter(
-            recipe__recipe_in_cart__user=user).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(ingredient_amount=Sum('amount'))
-        result = ['Список покупок:']
-        for ingredient in ingredients:
-            result.append(
-                f'    ·{ingredient["ingredient__name"]} — '
-                f'{ingredient["ingredient_amount"]}'
-                f' {ingredient["ingredient__measurement_unit"]}'
-            )
-        result = '\n'.join(result)
-        response = HttpResponse(
-            result,
-            content_type='text.txt; charset=utf-8'
+        export_format = request.accepted_renderer.format
+        etag = quote_etag(
+            f'{get_shopping_list_version(user)}-{export_format}'
+        )
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            return response
+        exporter, content_type = EXPORTERS[export_format]
+        response = StreamingHttpResponse(
+            exporter(get_shopping_list(user).iterator()),
+            content_type=content_type
+        )
+        response['ETag'] = etag
+        response['Content-Disposition'] = (
+            f'attachment; filename=ShopList.{export_format}'
         )
-        response['Content-Disposition'] = 'attachment; filename=ShopList.txt'
         return response
 
 
-class IngredientViewSet(ModelViewSet):
+class IngredientViewSet(ConditionalGetMixin, CachedListMixin, ModelViewSet):
     """Вьюсет для ингредиента."""
+    cache_namespace = 'ingredients'
+    uncached_params = ('name', )
+    etag_namespaces = ('ingredients', )
+    query_budgets = {'list': 2, 'retrieve': 2, 'autocomplete': 2}
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAdminOrReadOnly, )
     http_method_names = ['post', 'get', 'patch', 'delete']
     filter_backends = [IngredientFilter]
-    search_fields = ['^name']
+
+    @action(
+        detail=False,
+        methods=['get', ],
+        pagination_class=None
+    )
+    def autocomplete(self, request):
+        """Эндпоинт для автодополнения названий ингредиентов."""
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 10
+        return Response(ingredient_index.search(
+            request.query_params.get('name', ''),
+            min(max(limit, 1), 50)
+        ))
 
 
-class TagViewSet(ModelViewSet):
+class TagViewSet(ConditionalGetMixin, CachedListMixin, ModelViewSet):
     """Вьюсет для тэга."""
+    cache_namespace = 'tags'
+    etag_namespaces = ('tags', )
+    query_budgets = {'list': 2, 'retrieve': 2}
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [IsAdminOrReadOnly, ]
     http_method_names = ['post', 'get', 'patch', 'delete']
+
+
+class MetricsView(APIView):
+    """Накопленные показатели представлений текущего процесса."""
+    permission_classes = (IsAdminUser, )
+
+    def get(self, request):
+        return Response(view_metrics.snapshot())
+
+    def delete(self, request):
+        view_metrics.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ProfileViewSet(ViewSet):
+    """Сохранённые профили запросов для сотрудников."""
+    permission_classes = (IsAdminUser, )
+    lookup_value_regex = r'\d{20}-[0-9a-f]{8}'
+
+    def list(self, request):
+        return Response(profile_store.list())
+
+    def retrieve(self, request, pk=None):
+        summary = profile_store.get(pk)
+        if summary is None:
+            return Response(
+                {'errors': 'Профиль не найден'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(summary)
+
+    @action(detail=True, methods=['get', ])
+    def prof(self, request, pk=None):
+        """Эндпоинт для скачивания профиля в формате pstats."""
+        try:
+            return FileResponse(
+                open(profile_store.path(pk, 'prof'), 'rb'),
+                as_attachment=True,
+                filename=f'{pk}.prof'
+            )
+        except FileNotFoundError:
+            return Response(
+                {'errors': 'Профиль не найден'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+
+def prometheus_metrics(request):
+    """Метрики всех воркеров в текстовом формате Prometheus."""
+    if not access_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -35,11 +36,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.QueryMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -129,12 +132,77 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'],
 }
 
+# Кэш, общий для воркеров gunicorn (см. api.utils.cache_is_shared).
+if os.getenv('MEMCACHED_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': os.getenv('MEMCACHED_LOCATION'),
+        }
+    }
+API_CACHE_LOCAL = os.getenv('API_CACHE_LOCAL', 'False') == 'True'
+
+TOKEN_CACHE = {
+    'TTL': 60,
+    'ENABLED': True,
+}
+
+# Лента подписок: 'read' собирает ленту запросом через подписки,
+# 'write' раскладывает рецепты по таблице лент при публикации.
+FEED_STRATEGY = os.getenv('FEED_STRATEGY', 'read')
+
+# TrueType-шрифт с кириллицей, встраиваемый в PDF списка покупок.
+# Без него PDF ссылается на невстроенный Helvetica, и часть программ
+# просмотра не показывает русские названия ингредиентов.
+SHOPPING_LIST_PDF_FONT = os.getenv('SHOPPING_LIST_PDF_FONT')
+
+# Быстрое чтение списков рецептов: словари из .values() вместо
+# RecipeSerializer. Ответ тот же, False возвращает серилизатор.
+API_FAST_READ = os.getenv('API_FAST_READ', 'True') == 'True'
+
+# Метрики представлений: HEADERS добавляет заголовки X-Query-*,
+# BUDGET_MODE задаёт реакцию на превышение бюджета запросов:
+# 'off', 'log' или 'raise' (для тестов).
+API_METRICS = {
+    'HEADERS': os.getenv('API_METRICS_HEADERS', 'False') == 'True',
+    'BUDGET_MODE': os.getenv('QUERY_BUDGET_MODE', 'log'),
+}
+
+# Метрики Prometheus на /metrics. С MULTIPROCESS_DIR воркеры gunicorn
+# сбрасывают снимки в файлы каталога, и /metrics суммирует их.
+# /metrics доступен с адресов и подсетей ALLOWED_IPS или с заголовком
+# Authorization: Bearer <TOKEN>.
+PROMETHEUS = {
+    'MULTIPROCESS_DIR': os.getenv('PROMETHEUS_MULTIPROC_DIR'),
+    'FLUSH_INTERVAL': float(os.getenv('PROMETHEUS_FLUSH_INTERVAL', 1)),
+    'ALLOWED_IPS': [
+        network for network in os.getenv(
+            'PROMETHEUS_ALLOWED_IPS', '127.0.0.1,::1'
+        ).split(',') if network
+    ],
+    'TOKEN': os.getenv('PROMETHEUS_TOKEN'),
+}
+
+# Профилирование запросов сотрудников по заголовку X-Profile или
+# параметру _profile, по умолчанию выключено. Хранятся последние
+# MAX_PROFILES профилей в DIR, доступном воркерам на запись: каталог
+# приложения в контейнере может быть только для чтения.
+PROFILING = {
+    'ENABLED': os.getenv('PROFILING_ENABLED', 'False') == 'True',
+    'DIR': os.getenv(
+        'PROFILING_DIR',
+        os.path.join(tempfile.gettempdir(), 'foodgram-profiles')
+    ),
+    'MAX_PROFILES': int(os.getenv('PROFILING_MAX_PROFILES', 50)),
+    'TOP': 40,
+}
+
 
 # Djoser
 
@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from api.views import prometheus_metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', include('api.urls'), name='api')
+    path('api/', include('api.urls'), name='api'),
+    path('metrics', prometheus_metrics, name='metrics'),
 ]
@@ -0,0 +1,15 @@
+import os
+import shutil
+
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/foodgram-metrics')
+
+
+def on_starting(server):
+    """Удаляет снимки метрик, оставшиеся от прошлого запуска."""
+    shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+
+
+def worker_exit(server, worker):
+    """Сохраняет последние значения метрик завершающегося воркера."""
+    from api.prometheus import registry
+    registry.flush()
@@ -0,0 +1,119 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.core.cache import cache
+
+from .models import Ingredient
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Названия в нижнем регистре хранятся в отсортированных списках, в
+    ответе они возвращаются как в базе. Сначала бинарным поиском
+    ищутся названия, начинающиеся с запроса, затем слова внутри
+    названий. Поиск подстроки идёт перебором, поэтому он включается с
+    substring_min_length символов и просматривает не больше
+    substring_scan_limit названий: в больших справочниках вхождения
+    дальше этой границы не находятся. Индекс
+    перестраивается, когда меняется версия в кэше или истекает max_age.
+    """
+    version_key = 'ingredient_index_version'
+    max_age = 300
+    substring_min_length = 3
+    substring_scan_limit = 20000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.built_at = 0
+        self.snapshot = ([], [], [])
+
+    def get_version(self):
+        return cache.get(self.version_key, 0)
+
+    def invalidate(self):
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            cache.set(self.version_key, 1, None)
+
+    def build(self, version):
+        items = sorted(
+            Ingredient.objects.values_list('id', 'name', 'measurement_unit'),
+            key=lambda item: (item[1].lower(), item[0])
+        )
+        names = [name.lower() for _, name, _ in items]
+        words = sorted(
+            (name[start:], index)
+            for index, name in enumerate(names)
+            for start in range(1, len(name))
+            if name[start - 1] == ' ' and name[start] != ' '
+        )
+        self.snapshot = (items, names, words)
+        self.version = version
+        self.built_at = time.monotonic()
+
+    def ensure_fresh(self):
+        version = self.get_version()
+        if (version == self.version
+                and time.monotonic() - self.built_at < self.max_age):
+            return
+        with self.lock:
+            if version != self.version or (
+                    time.monotonic() - self.built_at >= self.max_age):
+                self.build(version)
+
+    def search(self, query, limit=10):
+        """Ингредиенты по запросу: сначала совпадения с начала названия."""
+        self.ensure_fresh()
+        query = query.strip().lower()
+        if not query or limit < 1:
+            return []
+        items, names, words = self.snapshot
+        found = []
+        seen = set()
+
+        def add(index):
+            if index not in seen:
+                seen.add(index)
+                found.append(index)
+            return len(found) >= limit
+
+        position = bisect_left(names, query)
+        while position < len(names) and names[position].startswith(query):
+            if add(position):
+                return self.serialize(items, found)
+            position += 1
+        position = bisect_left(words, (query,))
+        while (position < len(words)
+               and words[position][0].startswith(query)):
+            if add(words[position][1]):
+                return self.serialize(items, found)
+            position += 1
+        self.find_substrings(names, query, add)
+        return self.serialize(items, found)
+
+    def find_substrings(self, names, query, add):
+        """Вхождения запроса в первые substring_scan_limit названий."""
+        if len(query) < self.substring_min_length:
+            return
+        for index, name in enumerate(names[:self.substring_scan_limit]):
+            if query in name and add(index):
+                return
+
+    def serialize(self, items, indexes):
+        return [
+            {
+                'id': ingredient_id,
+                'name': name,
+                'measurement_unit': measurement_unit,
+            }
+            for ingredient_id, name, measurement_unit in (
+                items[index] for index in indexes
+            )
+        ]
+
+
+ingredient_index = IngredientIndex()
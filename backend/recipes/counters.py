@@ -0,0 +1,42 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from users.models import Subscription, User
+from .models import Favorite, Recipe, ShoppingCart
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscription, 'follower'),
+)
+
+
+def count_subquery(model, field):
+    """Количество связанных строк для внешнего запроса."""
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+def reconcile_counters():
+    """Исправляет разошедшиеся счётчики.
+
+    Возвращает количество исправленных строк для каждого счётчика.
+    """
+    fixed = {}
+    for model, counter, related_model, field in COUNTERS:
+        drifted = model.objects.annotate(
+            actual=count_subquery(related_model, field)
+        ).exclude(**{counter: F('actual')})
+        ids = list(drifted.values_list('pk', flat=True))
+        if ids:
+            model.objects.filter(pk__in=ids).update(
+                **{counter: count_subquery(related_model, field)}
+            )
+        fixed[f'{model.__name__}.{counter}'] = len(ids)
+    return fixed
@@ -0,0 +1,83 @@
+from django.conf import settings
+
+from users.models import Subscription
+from .models import FeedItem, Recipe
+
+FAN_OUT_ON_READ = 'read'
+FAN_OUT_ON_WRITE = 'write'
+STRATEGIES = (FAN_OUT_ON_READ, FAN_OUT_ON_WRITE)
+
+
+def get_strategy():
+    return getattr(settings, 'FEED_STRATEGY', FAN_OUT_ON_READ)
+
+
+def filter_feed(queryset, user, strategy=None):
+    """Рецепты авторов, на которых подписан пользователь.
+
+    При чтении лента собирается запросом через подписки, при записи
+    берётся из заранее заполненной таблицы FeedItem.
+    """
+    if (strategy or get_strategy()) == FAN_OUT_ON_WRITE:
+        return queryset.filter(feed_items__user=user)
+    return queryset.filter(author__follower__following=user)
+
+
+def fan_out_recipes(recipes, batch_size=1000):
+    """Раскладывает рецепты по лентам подписчиков их авторов.
+
+    Подписчики выбираются по batch_size авторов за запрос, строки ленты
+    вставляются пачками того же размера.
+    """
+    recipe_ids = {}
+    for recipe in recipes:
+        recipe_ids.setdefault(recipe.author_id, []).append(recipe.id)
+    author_ids = list(recipe_ids)
+    batch = []
+    for start in range(0, len(author_ids), batch_size):
+        for author_id, user_id in Subscription.objects.filter(
+            follower__in=author_ids[start:start + batch_size]
+        ).values_list('follower_id', 'following_id').iterator(batch_size):
+            batch.extend(
+                FeedItem(user_id=user_id, recipe_id=recipe_id)
+                for recipe_id in recipe_ids[author_id]
+            )
+            if len(batch) >= batch_size:
+                FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+    if batch:
+        FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def add_author_to_feed(user_id, author_id):
+    """Добавляет в ленту рецепты автора после подписки."""
+    FeedItem.objects.bulk_create([
+        FeedItem(user_id=user_id, recipe_id=recipe_id)
+        for recipe_id in Recipe.objects.filter(
+            author_id=author_id
+        ).values_list('pk', flat=True)
+    ], ignore_conflicts=True)
+
+
+def remove_author_from_feed(user_id, author_id):
+    """Убирает из ленты рецепты автора после отписки."""
+    FeedItem.objects.filter(
+        user_id=user_id,
+        recipe__author_id=author_id
+    ).delete()
+
+
+def rebuild_feeds(batch_size=1000):
+    """Заново заполняет ленты всех пользователей."""
+    FeedItem.objects.all().delete()
+    recipes = Recipe.objects.filter(
+        author__follower__isnull=False
+    ).distinct().only('pk', 'author_id')
+    batch = []
+    for recipe in recipes.iterator():
+        batch.append(recipe)
+        if len(batch) == batch_size:
+            fan_out_recipes(batch, batch_size)
+            batch = []
+    if batch:
+        fan_out_recipes(batch, batch_size)
@@ -0,0 +1,140 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.feed import STRATEGIES, fan_out_recipes, filter_feed
+from recipes.models import Recipe
+from users.models import Subscription, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает стратегии ленты подписок: чтение ленты читателя, '
+        'подписанного на N авторов, и публикацию рецепта автором с N '
+        'подписчиками. Данные создаются во временной транзакции и '
+        'откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--follows',
+            type=int,
+            nargs='*',
+            default=[10, 1000, 100000],
+            help='Количество подписок читателя.'
+        )
+        parser.add_argument(
+            '--followers',
+            type=int,
+            nargs='*',
+            default=[10, 1000, 100000],
+            help='Количество подписчиков автора.'
+        )
+        parser.add_argument(
+            '--recipes-per-author',
+            type=int,
+            default=2,
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=6,
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+        )
+
+    def measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def create_users(self, prefix, count):
+        User.objects.bulk_create([
+            User(
+                email=f'{prefix}-{number}@benchmark.local',
+                username=f'{prefix}-{number}'
+            ) for number in range(count)
+        ], batch_size=1000)
+        return list(User.objects.filter(username__startswith=f'{prefix}-'))
+
+    def create_recipes(self, authors, recipes_per_author):
+        Recipe.objects.bulk_create([
+            Recipe(
+                author=author,
+                name=f'feed-recipe-{number}',
+                text='benchmark',
+                image='recipes/images/benchmark.png'
+            ) for author in authors
+            for number in range(recipes_per_author)
+        ], batch_size=1000)
+        return list(Recipe.objects.filter(
+            name__startswith='feed-recipe-'
+        ).only('pk', 'author_id'))
+
+    def measure_reads(self, reader, options):
+        results = []
+        for strategy in STRATEGIES:
+            def read_page():
+                return list(filter_feed(
+                    Recipe.objects.all(), reader, strategy
+                ).order_by('-pub_date', '-id')[:options['page_size']])
+            timing = self.measure(read_page, options['repeat'])
+            results.append(f'{strategy}: {timing:.2f} мс')
+        return results
+
+    def benchmark_reader(self, follows, options):
+        """Читатель, подписанный на follows авторов."""
+        reader = self.create_users('feed-reader', 1)[0]
+        authors = self.create_users('feed-author', follows)
+        Subscription.objects.bulk_create([
+            Subscription(following=reader, follower=author)
+            for author in authors
+        ], batch_size=1000)
+        recipes = self.create_recipes(
+            authors, options['recipes_per_author']
+        )
+        fan_out = self.measure(lambda: fan_out_recipes(recipes), 1)
+        return [f'fan-out всех рецептов: {fan_out:.1f} мс',
+                *self.measure_reads(reader, options)]
+
+    def benchmark_author(self, followers, options):
+        """Автор с followers подписчиками публикует рецепт."""
+        author = self.create_users('feed-author', 1)[0]
+        readers = self.create_users('feed-reader', followers)
+        Subscription.objects.bulk_create([
+            Subscription(following=reader, follower=author)
+            for reader in readers
+        ], batch_size=1000)
+        recipes = self.create_recipes([author], options['recipes_per_author'])
+        fan_out = self.measure(lambda: fan_out_recipes(recipes[:1]), 1)
+        fan_out_recipes(recipes[1:])
+        results = [f'fan-out одного рецепта: {fan_out:.1f} мс']
+        if readers:
+            results.extend(self.measure_reads(readers[0], options))
+        return results
+
+    def handle(self, *args, **options):
+        if (min([*options['follows'], *options['followers']], default=0) < 0
+                or options['repeat'] < 1
+                or options['recipes_per_author'] < 1):
+            raise CommandError(
+                'Нужны неотрицательные --follows и --followers, '
+                'положительные --repeat и --recipes-per-author'
+            )
+        for label, benchmark, sizes in (
+            ('Подписок', self.benchmark_reader, options['follows']),
+            ('Подписчиков', self.benchmark_author, options['followers']),
+        ):
+            for count in sizes:
+                with transaction.atomic():
+                    results = benchmark(count, options)
+                    transaction.set_rollback(True)
+                self.stdout.write(f'{label} {count}: ' + ', '.join(results))
@@ -0,0 +1,281 @@
+import random
+import time
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import reconcile_counters
+from recipes.feed import FAN_OUT_ON_WRITE, get_strategy, rebuild_feeds
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Tag)
+from recipes.search import update_search_documents
+from recipes.services import rebuild_shopping_lists
+from recipes.signals import data_generated
+from users.models import Subscription, User
+
+WORDS = (
+    'суп', 'салат', 'пирог', 'курица', 'говядина', 'рыба', 'картофель',
+    'томат', 'сыр', 'грибы', 'рис', 'паста', 'яблоко', 'шоколад',
+    'запечённый', 'жареный', 'тушёный', 'острый', 'сладкий', 'домашний',
+)
+UNITS = ('г', 'кг', 'мл', 'л', 'шт', 'ст. л.', 'ч. л.')
+
+
+def power_law_weights(count, exponent):
+    """Накопленные веса 1 / rank ** exponent для random.choices."""
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+def choose_distinct(rng, population, cum_weights, count):
+    """До count разных элементов, выбранных с заданными весами."""
+    if not population or count < 1:
+        return set()
+    count = min(count, len(population))
+    chosen = set()
+    for _ in range(4):
+        chosen.update(rng.choices(
+            population, cum_weights=cum_weights, k=count - len(chosen)
+        ))
+        if len(chosen) >= count:
+            break
+    return chosen
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт воспроизводимый набор тестовых данных: пользователей, '
+        'рецепты, тэги, ингредиенты, избранное, корзины и подписки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            default=2000,
+            help='Сколько ингредиентов создать, если справочник пуст.'
+        )
+        parser.add_argument(
+            '--ingredients-per-recipe',
+            type=int,
+            nargs=2,
+            default=[3, 12],
+            metavar=('MIN', 'MAX'),
+        )
+        parser.add_argument(
+            '--favorites',
+            type=int,
+            default=20,
+            help='Среднее число рецептов в избранном пользователя.'
+        )
+        parser.add_argument(
+            '--carts',
+            type=int,
+            default=3,
+            help='Среднее число рецептов в корзине пользователя.'
+        )
+        parser.add_argument(
+            '--subscriptions',
+            type=int,
+            default=10,
+            help='Среднее число подписок пользователя.'
+        )
+        parser.add_argument(
+            '--zipf',
+            type=float,
+            default=1.1,
+            help='Показатель распределения Ципфа популярности рецептов.'
+        )
+        parser.add_argument(
+            '--power-law',
+            type=float,
+            default=1.5,
+            help='Показатель степенного распределения авторов.'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def count_around(self, rng, average):
+        return rng.randint(0, 2 * average) if average > 0 else 0
+
+    def create_tags(self, seed, prefix, count):
+        Tag.objects.bulk_create([
+            Tag(
+                name=f'{prefix} тэг {number}',
+                slug=f'{prefix}-tag-{number}',
+                color='#{:06x}'.format(
+                    (seed * 104729 + number * 7919) % 0x1000000
+                ),
+            ) for number in range(count)
+        ], ignore_conflicts=True)
+        return list(Tag.objects.filter(
+            slug__startswith=f'{prefix}-tag-'
+        ).order_by('id').values_list('id', flat=True))
+
+    def create_ingredients(self, rng, count, batch_size):
+        if not Ingredient.objects.exists():
+            Ingredient.objects.bulk_create([
+                Ingredient(
+                    name=f'{rng.choice(WORDS)} {number}',
+                    measurement_unit=rng.choice(UNITS)
+                ) for number in range(count)
+            ], batch_size=batch_size, ignore_conflicts=True)
+        return list(Ingredient.objects.order_by('id').values_list(
+            'id', flat=True
+        ))
+
+    def create_users(self, prefix, count, batch_size):
+        password = make_password(prefix)
+        User.objects.bulk_create([
+            User(
+                email=f'{prefix}-{number}@seed.local',
+                username=f'{prefix}-{number}',
+                first_name='Пользователь',
+                last_name=str(number),
+                password=password
+            ) for number in range(count)
+        ], batch_size=batch_size)
+        return list(User.objects.filter(
+            username__startswith=f'{prefix}-'
+        ).order_by('id').values_list('id', flat=True))
+
+    def create_recipes(self, rng, prefix, users, count, exponent,
+                       batch_size):
+        authors = users[:]
+        rng.shuffle(authors)
+        weights = power_law_weights(len(authors), exponent)
+        Recipe.objects.bulk_create([
+            Recipe(
+                author_id=author_id,
+                name=f'{" ".join(rng.sample(WORDS, 2)).capitalize()} '
+                     f'{prefix}-{number}',
+                text=' '.join(rng.choices(WORDS, k=rng.randint(10, 40))),
+                cooking_time=rng.randint(5, 180),
+                image='recipes/images/seed.png'
+            ) for number, author_id in enumerate(
+                rng.choices(authors, cum_weights=weights, k=count)
+            )
+        ], batch_size=batch_size)
+        return list(Recipe.objects.filter(
+            name__contains=f' {prefix}-'
+        ).order_by('id').values_list('id', flat=True))
+
+    def create_recipe_relations(self, rng, recipes, tags, ingredients,
+                                per_recipe, batch_size):
+        low, high = per_recipe
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipes if tags
+            for tag_id in rng.sample(tags, rng.randint(1, min(3, len(tags))))
+        ], batch_size=batch_size)
+        IngredientRecipe.objects.bulk_create([
+            IngredientRecipe(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=rng.randint(1, 500)
+            )
+            for recipe_id in recipes
+            for ingredient_id in rng.sample(
+                ingredients, min(rng.randint(low, high), len(ingredients))
+            )
+        ], batch_size=batch_size)
+
+    def create_marks(self, rng, model, users, recipes, average, exponent,
+                     batch_size):
+        popular = recipes[:]
+        rng.shuffle(popular)
+        weights = power_law_weights(len(popular), exponent)
+        model.objects.bulk_create([
+            model(user_id=user_id, recipe_id=recipe_id)
+            for user_id in users
+            for recipe_id in sorted(choose_distinct(
+                rng, popular, weights, self.count_around(rng, average)
+            ))
+        ], batch_size=batch_size)
+
+    def create_subscriptions(self, rng, users, average, exponent,
+                             batch_size):
+        authors = users[:]
+        rng.shuffle(authors)
+        weights = power_law_weights(len(authors), exponent)
+        Subscription.objects.bulk_create([
+            Subscription(following_id=user_id, follower_id=author_id)
+            for user_id in users
+            for author_id in sorted(choose_distinct(
+                rng, authors, weights, self.count_around(rng, average)
+            ) - {user_id})
+        ], batch_size=batch_size)
+
+    def update_search(self, recipes, batch_size):
+        for start in range(0, len(recipes), batch_size):
+            update_search_documents(
+                recipes[start:start + batch_size], batch_size
+            )
+
+    def step(self, name, func, *args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.stdout.write(
+                f'{name}: {time.perf_counter() - started:.1f} с'
+            )
+
+    def handle(self, *args, **options):
+        seed = options['seed']
+        rng = random.Random(seed)
+        prefix = f'seed{seed}'
+        batch_size = options['batch_size']
+        if User.objects.filter(username__startswith=f'{prefix}-').exists():
+            self.stderr.write(f'Данные с seed={seed} уже созданы')
+            return
+        with transaction.atomic():
+            tags = self.step(
+                'Тэги', self.create_tags, seed, prefix, options['tags'])
+            ingredients = self.step(
+                'Ингредиенты', self.create_ingredients,
+                rng, options['ingredients'], batch_size)
+            users = self.step(
+                'Пользователи', self.create_users,
+                prefix, options['users'], batch_size)
+            recipes = self.step(
+                'Рецепты', self.create_recipes, rng, prefix, users,
+                options['recipes'], options['power_law'], batch_size)
+            self.step(
+                'Тэги и ингредиенты рецептов',
+                self.create_recipe_relations, rng, recipes, tags,
+                ingredients, options['ingredients_per_recipe'], batch_size)
+            for name, model, average in (
+                ('Избранное', Favorite, options['favorites']),
+                ('Корзины', ShoppingCart, options['carts']),
+            ):
+                self.step(
+                    name, self.create_marks, rng, model, users, recipes,
+                    average, options['zipf'], batch_size)
+            self.step(
+                'Подписки', self.create_subscriptions, rng, users,
+                options['subscriptions'], options['power_law'], batch_size)
+            self.step('Счётчики', reconcile_counters)
+            self.step(
+                'Поисковые документы', self.update_search, recipes,
+                batch_size)
+            self.step(
+                'Списки покупок', rebuild_shopping_lists,
+                ShoppingCart.objects.filter(
+                    user_id__in=users
+                ).values_list('user_id', flat=True).distinct(),
+                batch_size)
+            if get_strategy() == FAN_OUT_ON_WRITE:
+                self.step('Ленты подписок', rebuild_feeds, batch_size)
+            transaction.on_commit(
+                lambda: data_generated.send(sender=self.__class__)
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: пользователей {len(users)}, рецептов {len(recipes)}'
+        ))
@@ -1,25 +1,129 @@
+import csv
 import json
+import os
+import time
+from itertools import islice
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
 from recipes.models import Ingredient
+from recipes.signals import ingredients_loaded
 
-csv_files = {
-    Ingredient: './data/ingredients.json'
+DEFAULT_PATH = './data/ingredients.json'
+CSV_HEADER = ('name', 'measurement_unit')
+
+
+def iter_json(file, chunk_size=65536):
+    """Потоково читает объекты из JSON-массива."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if buffer[:1] != '[':
+        raise CommandError('Ожидается JSON-массив')
+    position = 1
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if buffer[position:position + 1] == ']':
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except ValueError:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise CommandError('Некорректный JSON')
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item['name'], item['measurement_unit']
+
+
+def iter_csv(file):
+    """Потоково читает строки CSV: название, мера измерения."""
+    for number, row in enumerate(csv.reader(file)):
+        if not row:
+            continue
+        if number == 0 and tuple(row) == CSV_HEADER:
+            continue
+        yield row[0], row[1]
+
+
+READERS = {
+    'json': iter_json,
+    'csv': iter_csv,
 }
 
 
+def normalize(name, measurement_unit):
+    """Приводит значения к виду, который задаёт Ingredient.clean."""
+    return name.strip().lower(), measurement_unit.strip().lower()
+
+
 class Command(BaseCommand):
+    help = 'Загружает ингредиенты из файлов JSON или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            default=[DEFAULT_PATH],
+            help='Файлы с ингредиентами.'
+        )
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='Формат файлов, по умолчанию определяется по расширению.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Размер пачки при вставке строк.'
+        )
+
+    def get_reader(self, path, file_format):
+        file_format = file_format or os.path.splitext(path)[1][1:].lower()
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        return READERS[file_format]
 
     def handle(self, *args, **options):
-        with open(csv_files[Ingredient], encoding='utf-8') as f:
-            jsondata = json.load(f)
-            for line in jsondata:
-                if not Ingredient.objects.filter(
-                    name=line['name'],
-                    measurement_unit=line['measurement_unit']
-                ).exists():
-                    Ingredient.objects.create(
-                        name=line['name'],
-                        measurement_unit=line['measurement_unit']
-                    )
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('Размер пачки должен быть больше 0')
+        started = time.monotonic()
+        total = 0
+        with transaction.atomic():
+            count_before = Ingredient.objects.count()
+            for path in options['paths']:
+                reader = self.get_reader(path, options['format'])
+                with open(path, encoding='utf-8', newline='') as file:
+                    rows = reader(file)
+                    while True:
+                        batch = [
+                            Ingredient(
+                                name=name,
+                                measurement_unit=measurement_unit
+                            ) for name, measurement_unit in (
+                                normalize(*row)
+                                for row in islice(rows, batch_size)
+                            )
+                        ]
+                        if not batch:
+                            break
+                        Ingredient.objects.bulk_create(
+                            batch,
+                            ignore_conflicts=True
+                        )
+                        total += len(batch)
+            inserted = Ingredient.objects.count() - count_before
+            if inserted:
+                transaction.on_commit(
+                    lambda: ingredients_loaded.send(sender=self.__class__)
+                )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {total}, добавлено: {inserted}, '
+            f'пропущено: {total - inserted} '
+            f'за {elapsed:.2f} с ({total / max(elapsed, 1e-6):.0f} строк/с)'
+        ))
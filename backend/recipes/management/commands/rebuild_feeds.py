@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.feed import rebuild_feeds
+from recipes.models import FeedItem
+
+
+class Command(BaseCommand):
+    help = 'Заново заполняет ленты подписок для стратегии write.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Размер пачки при вставке строк.'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_feeds(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Строк в лентах: {FeedItem.objects.count()}'
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.search import update_search_documents
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает поисковые документы всех рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество рецептов в одной пачке.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        recipe_ids = list(Recipe.objects.order_by('id').values_list(
+            'id', flat=True
+        ))
+        for start in range(0, len(recipe_ids), batch_size):
+            update_search_documents(
+                recipe_ids[start:start + batch_size], batch_size
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рецептов: {len(recipe_ids)}'
+        ))
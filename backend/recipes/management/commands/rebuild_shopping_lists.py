@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import ShoppingCart, ShoppingListItem
+from recipes.services import aggregate_shopping_lists, rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает списки покупок и сверяет их с корзинами.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Размер пачки при вставке строк.'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = set(
+            ShoppingCart.objects.values_list('user_id', flat=True)
+        )
+        with transaction.atomic():
+            ShoppingListItem.objects.exclude(user_id__in=user_ids).delete()
+            rebuild_shopping_lists(user_ids, options['batch_size'])
+        expected = {
+            (row['recipe__recipe_in_cart__user_id'], row['ingredient_id']):
+            row['total'] for row in aggregate_shopping_lists(user_ids)
+        }
+        stored = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount
+            in ShoppingListItem.objects.values_list(
+                'user_id', 'ingredient_id', 'amount')
+        }
+        mismatched = set(expected.items()) ^ set(stored.items())
+        if mismatched:
+            raise CommandError(
+                f'Расхождение в {len(mismatched)} строках списков покупок'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано списков: {len(user_ids)}, строк: {len(stored)}'
+        ))
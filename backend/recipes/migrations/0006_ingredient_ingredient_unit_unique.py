@@ -0,0 +1,63 @@
+# Generated by Django 3.2.19 on 2026-10-17 04:28
+
+from django.db import migrations, models
+
+MAX_AMOUNT = 32767
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    kept = {}
+    duplicates = {}
+    for ingredient in Ingredient.objects.order_by('id'):
+        key = (ingredient.name.lower(), ingredient.measurement_unit.lower())
+        if key in kept:
+            duplicates[ingredient.id] = kept[key]
+            continue
+        kept[key] = ingredient.id
+        if key != (ingredient.name, ingredient.measurement_unit):
+            Ingredient.objects.filter(pk=ingredient.id).update(
+                name=key[0], measurement_unit=key[1]
+            )
+    if not duplicates:
+        return
+    for duplicate_id, kept_id in duplicates.items():
+        kept_rows = {
+            row.recipe_id: row
+            for row in IngredientRecipe.objects.filter(ingredient_id=kept_id)
+        }
+        for row in IngredientRecipe.objects.filter(
+            ingredient_id=duplicate_id, recipe_id__in=list(kept_rows)
+        ):
+            kept_row = kept_rows[row.recipe_id]
+            kept_row.amount = min(kept_row.amount + row.amount, MAX_AMOUNT)
+            kept_row.save(update_fields=['amount'])
+            row.delete()
+        IngredientRecipe.objects.filter(
+            ingredient_id=duplicate_id).update(ingredient_id=kept_id)
+    ShoppingListItem.objects.filter(
+        user_id__in=ShoppingListItem.objects.filter(
+            ingredient_id__in=list(duplicates)
+        ).values('user_id')
+    ).delete()
+    Ingredient.objects.filter(id__in=list(duplicates)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_auto_20261017_0426'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients,
+            migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='ingredient_unit_unique'),
+        ),
+    ]
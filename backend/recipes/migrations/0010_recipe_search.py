@@ -0,0 +1,100 @@
+# Generated by Django 3.2.19 on 2026-10-17 04:39
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+
+FTS_TABLE = 'recipes_recipe_search'
+
+
+class PostgresAddIndex(migrations.AddIndex):
+    """GIN-индекс создаётся только в Postgres."""
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} '
+            'USING fts5(name, ingredients, text)'
+        )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def fill_search_documents(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    names = {}
+    for recipe_id, name in IngredientRecipe.objects.order_by(
+        'ingredient__name'
+    ).values_list('recipe_id', 'ingredient__name').iterator():
+        names.setdefault(recipe_id, []).append(name)
+    recipes = list(Recipe.objects.only('id', 'name', 'text'))
+    for recipe in recipes:
+        recipe.search_ingredients = ' '.join(names.get(recipe.id, ()))
+    Recipe.objects.bulk_update(
+        recipes, ['search_ingredients'], batch_size=1000
+    )
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        Recipe.objects.update(search_vector=(
+            SearchVector('name', weight='A', config='russian')
+            + SearchVector('search_ingredients', weight='B',
+                           config='russian')
+            + SearchVector('text', weight='C', config='russian')
+        ))
+    elif vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} '
+                '(rowid, name, ingredients, text) VALUES (%s, %s, %s, %s)',
+                [
+                    (recipe.id, recipe.name, recipe.search_ingredients,
+                     recipe.text)
+                    for recipe in recipes
+                ]
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_auto_20261017_0436'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_ingredients',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Ингредиенты для поиска'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        PostgresAddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+    ]
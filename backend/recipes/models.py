@@ -1,6 +1,9 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
 
+from users.counters import CounterFieldsMixin
 from users.models import User
 
 
@@ -53,6 +56,18 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='ingredient_unit_unique')
+        ]
+        indexes = [
+            models.Index(
+                fields=['name'],
+                name='ingredient_name_prefix_idx',
+                opclasses=['varchar_pattern_ops']
+            ),
+        ]
 
     def clean(self):
         self.name = self.name.lower()
@@ -60,8 +75,9 @@ class Ingredient(models.Model):
         return super().clean()
 
 
-class Recipe(models.Model):
+class Recipe(CounterFieldsMixin, models.Model):
     """Модель для рецептов."""
+    counter_fields = ('favorites_count', 'carts_count')
     author = models.ForeignKey(
         User,
         related_name='recipes',
@@ -104,11 +120,46 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Количество добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+    carts_count = models.PositiveIntegerField(
+        verbose_name='Количество добавлений в корзину',
+        default=0,
+        editable=False,
+    )
+    search_ingredients = models.TextField(
+        verbose_name='Ингредиенты для поиска',
+        blank=True,
+        default='',
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['-favorites_count', '-pub_date', '-id'],
+                name='recipe_popular_idx'
+            ),
+            GinIndex(
+                fields=['search_vector'],
+                name='recipe_search_vector_idx'
+            ),
+        ]
 
 
 class IngredientRecipe(models.Model):
@@ -187,3 +238,56 @@ class Favorite(models.Model):
                 fields=['user', 'recipe'],
                 name='favorute_unique')
         ]
+
+
+class ShoppingListItem(models.Model):
+    """Модель суммарного количества ингредиента в списке покупок."""
+    user = models.ForeignKey(
+        User,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество',
+    )
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списке покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='shopping_list_item_unique')
+        ]
+
+
+class FeedItem(models.Model):
+    """Модель ленты подписок, заполняемой при публикации рецепта."""
+    user = models.ForeignKey(
+        User,
+        related_name='feed_items',
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name='feed_items',
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE
+    )
+
+    class Meta:
+        verbose_name = 'Рецепт в ленте'
+        verbose_name_plural = 'Рецепты в ленте'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='feed_item_unique')
+        ]
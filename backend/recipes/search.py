@@ -0,0 +1,133 @@
+import re
+
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection, transaction
+from django.db.models import F, FloatField, Func, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import IngredientRecipe, Recipe
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_search'
+FTS_WEIGHTS = (10.0, 5.0, 1.0)
+WORD_RE = re.compile(r'\w+')
+
+
+def search_vector():
+    """Поисковый вектор: название важнее ингредиентов, они важнее текста."""
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('search_ingredients', weight='B', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_documents(recipe_ids, batch_size=1000):
+    """Пересобирает поисковые документы рецептов.
+
+    Названия ингредиентов складываются в поле search_ingredients, из
+    него и полей рецепта строится tsvector в Postgres или строка
+    таблицы FTS5 в SQLite. Удалённые рецепты убираются из FTS5.
+    """
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+    names = {}
+    for recipe_id, name in IngredientRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('ingredient__name').values_list(
+        'recipe_id', 'ingredient__name'
+    ):
+        names.setdefault(recipe_id, []).append(name)
+    recipes = list(Recipe.objects.filter(pk__in=recipe_ids).only(
+        'id', 'name', 'text', 'search_ingredients'
+    ))
+    for recipe in recipes:
+        recipe.search_ingredients = ' '.join(names.get(recipe.id, ()))
+    with transaction.atomic():
+        Recipe.objects.bulk_update(
+            recipes, ['search_ingredients'], batch_size=batch_size
+        )
+        if connection.vendor == 'postgresql':
+            Recipe.objects.filter(pk__in=recipe_ids).update(
+                search_vector=search_vector()
+            )
+        elif connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                    [(recipe_id, ) for recipe_id in recipe_ids]
+                )
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE} '
+                    '(rowid, name, ingredients, text) VALUES (%s, %s, %s, %s)',
+                    [
+                        (recipe.id, recipe.name, recipe.search_ingredients,
+                         recipe.text)
+                        for recipe in recipes
+                    ]
+                )
+
+
+def schedule_search_update(recipe_ids):
+    """Обновление поисковых документов после фиксации транзакции."""
+    recipe_ids = set(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(lambda: update_search_documents(recipe_ids))
+
+
+def search_recipes(queryset, query):
+    """Рецепты, подходящие под запрос, от более релевантных к менее.
+
+    В Postgres используется tsvector с GIN-индексом, в SQLite — таблица
+    FTS5, в остальных базах — поиск подстрок.
+    """
+    words = WORD_RE.findall(query.lower())
+    if not words:
+        return queryset
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(
+            query, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-search_rank', '-pub_date', '-id')
+    if connection.vendor == 'sqlite':
+        return search_fts(queryset, words)
+    condition = Q()
+    for word in words:
+        condition &= (
+            Q(name__icontains=word)
+            | Q(search_ingredients__icontains=word)
+            | Q(text__icontains=word)
+        )
+    return queryset.filter(condition)
+
+
+class FTSRank(Func):
+    """Ранг bm25 рецепта в таблице FTS5 для запроса MATCH."""
+    arg_joiner = ' AND rowid = '
+    template = (
+        f'(SELECT bm25({FTS_TABLE}, '
+        f'{", ".join(str(weight) for weight in FTS_WEIGHTS)}) '
+        f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %(expressions)s)'
+    )
+    output_field = FloatField()
+
+    def __init__(self, match, **extra):
+        super().__init__(Value(match), F('pk'), **extra)
+
+
+def search_fts(queryset, words):
+    """Поиск по таблице FTS5 SQLite.
+
+    Совпадения и ранг берутся подзапросами к FTS5 без ссылок на имя
+    таблицы рецептов, поэтому выборку можно вкладывать в другие запросы.
+    """
+    match = ' '.join(f'"{word}"*' for word in words)
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match, )
+    )).annotate(
+        search_rank=FTSRank(match)
+    ).order_by('search_rank', '-pub_date', '-id')
@@ -0,0 +1,160 @@
+import hashlib
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Sum
+
+from .counters import count_subquery
+from .models import (Favorite, IngredientRecipe, Recipe, ShoppingCart,
+                     ShoppingListItem)
+
+COUNTER_FIELDS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'carts_count',
+}
+
+
+def aggregate_shopping_lists(user_ids):
+    """Суммы ингредиентов из корзин пользователей по живым данным."""
+    return IngredientRecipe.objects.filter(
+        recipe__recipe_in_cart__user_id__in=user_ids
+    ).values(
+        'recipe__recipe_in_cart__user_id',
+        'ingredient_id'
+    ).annotate(total=Sum('amount')).order_by()
+
+
+def rebuild_shopping_lists(user_ids, batch_size=1000):
+    """Пересчитывает сохранённые списки покупок пользователей."""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    with transaction.atomic():
+        ShoppingListItem.objects.filter(user_id__in=user_ids).delete()
+        ShoppingListItem.objects.bulk_create([
+            ShoppingListItem(
+                user_id=row['recipe__recipe_in_cart__user_id'],
+                ingredient_id=row['ingredient_id'],
+                amount=row['total']
+            ) for row in aggregate_shopping_lists(user_ids)
+        ], batch_size=batch_size)
+
+
+def schedule_shopping_list_rebuild(user_ids):
+    """Пересчёт списков покупок после фиксации текущей транзакции."""
+    user_ids = set(user_ids)
+    if user_ids:
+        transaction.on_commit(lambda: rebuild_shopping_lists(user_ids))
+
+
+def schedule_recipe_shopping_list_rebuild(recipe_ids):
+    """Пересчёт списков покупок всех, у кого рецепты лежат в корзине."""
+    schedule_shopping_list_rebuild(
+        ShoppingCart.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('user_id', flat=True)
+    )
+
+
+def get_shopping_list_items(user):
+    """Строки сохранённого списка покупок, при отсутствии строятся заново."""
+    items = ShoppingListItem.objects.filter(user=user)
+    if not items.exists():
+        rebuild_shopping_lists([user.id])
+    return items
+
+
+def get_shopping_list_version(user):
+    """Хэш содержимого списка покупок вместе с названиями и единицами."""
+    content = get_shopping_list_items(user).order_by(
+        'ingredient_id'
+    ).values_list(
+        'ingredient_id',
+        'amount',
+        'ingredient__name',
+        'ingredient__measurement_unit'
+    )
+    return hashlib.md5(repr(list(content)).encode()).hexdigest()
+
+
+def get_shopping_list(user):
+    """Сохранённый список покупок с названиями ингредиентов."""
+    return get_shopping_list_items(user).values(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        'amount'
+    ).order_by('ingredient__name')
+
+
+bulk_marks_state = threading.local()
+
+
+@contextmanager
+def bulk_marks():
+    """Массовое изменение отметок без обработчиков сигналов на строку.
+
+    Счётчики и список покупок один раз обновляет on_marks_changed.
+    """
+    bulk_marks_state.active = True
+    try:
+        yield
+    finally:
+        bulk_marks_state.active = False
+
+
+def in_bulk_marks():
+    return getattr(bulk_marks_state, 'active', False)
+
+
+def on_marks_changed(model, user_id, recipe_ids):
+    """Обновляет счётчики и список покупок после массовых изменений.
+
+    Счётчики пересчитываются по строкам после записи, поэтому
+    параллельные изменения тех же отметок их не сбивают.
+    """
+    if not recipe_ids:
+        return
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        **{COUNTER_FIELDS[model]: count_subquery(model, 'recipe')}
+    )
+    if model is ShoppingCart:
+        schedule_shopping_list_rebuild([user_id])
+
+
+def bulk_add_marks(model, user, recipe_ids):
+    """Добавляет рецепты в избранное или корзину одной вставкой.
+
+    Возвращает множества добавленных, уже отмеченных и ненайденных id.
+    """
+    recipe_ids = set(recipe_ids)
+    with transaction.atomic():
+        found = set(Recipe.objects.filter(
+            pk__in=recipe_ids
+        ).values_list('pk', flat=True))
+        existing = set(model.objects.filter(
+            user=user,
+            recipe_id__in=found
+        ).values_list('recipe_id', flat=True))
+        added = found - existing
+        model.objects.bulk_create(
+            [model(user=user, recipe_id=recipe_id) for recipe_id in added],
+            ignore_conflicts=True
+        )
+        on_marks_changed(model, user.id, added)
+    return added, existing, recipe_ids - found
+
+
+def bulk_remove_marks(model, user, recipe_ids):
+    """Убирает рецепты из избранного или корзины одним DELETE.
+
+    Возвращает множества удалённых и отсутствовавших id.
+    """
+    recipe_ids = set(recipe_ids)
+    with transaction.atomic():
+        marks = model.objects.filter(user=user, recipe_id__in=recipe_ids)
+        removed = set(marks.values_list('recipe_id', flat=True))
+        with bulk_marks():
+            marks.filter(recipe_id__in=removed).delete()
+        on_marks_changed(model, user.id, removed)
+    return removed, recipe_ids - removed
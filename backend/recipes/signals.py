@@ -0,0 +1,105 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from users.counters import change_counter
+from users.models import Subscription, User
+from .feed import (FAN_OUT_ON_WRITE, add_author_to_feed, fan_out_recipes,
+                   get_strategy, remove_author_from_feed)
+from .autocomplete import ingredient_index
+from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                     ShoppingCart)
+from .search import schedule_search_update
+from .services import (COUNTER_FIELDS, in_bulk_marks,
+                       schedule_recipe_shopping_list_rebuild,
+                       schedule_shopping_list_rebuild)
+
+ingredients_loaded = Signal()
+data_generated = Signal()
+
+
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def shopping_cart_changed(sender, instance, **kwargs):
+    if not in_bulk_marks():
+        schedule_shopping_list_rebuild([instance.user_id])
+
+
+@receiver((post_save, post_delete), sender=IngredientRecipe)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    schedule_recipe_shopping_list_rebuild([instance.recipe_id])
+    schedule_search_update([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_renamed(sender, instance, created, **kwargs):
+    if not created:
+        schedule_search_update(IngredientRecipe.objects.filter(
+            ingredient=instance
+        ).values_list('recipe_id', flat=True))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_text_changed(sender, instance, **kwargs):
+    schedule_search_update([instance.id])
+
+
+@receiver(data_generated)
+@receiver(ingredients_loaded)
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            User.objects.filter(pk=instance.author_id),
+            'recipes_count',
+            1
+        )
+        if get_strategy() == FAN_OUT_ON_WRITE:
+            fan_out_recipes([instance])
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, **kwargs):
+    if created and get_strategy() == FAN_OUT_ON_WRITE:
+        add_author_to_feed(instance.following_id, instance.follower_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    if get_strategy() == FAN_OUT_ON_WRITE:
+        remove_author_from_feed(instance.following_id, instance.follower_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    change_counter(
+        User.objects.filter(pk=instance.author_id),
+        'recipes_count',
+        -1
+    )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def recipe_mark_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            Recipe.objects.filter(pk=instance.recipe_id),
+            COUNTER_FIELDS[sender],
+            1
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def recipe_mark_deleted(sender, instance, **kwargs):
+    if in_bulk_marks():
+        return
+    change_counter(
+        Recipe.objects.filter(pk=instance.recipe_id),
+        COUNTER_FIELDS[sender],
+        -1
+    )
@@ -0,0 +1,31 @@
+from django.db.models import F
+
+
+def change_counter(queryset, field, delta):
+    """Атомарно меняет счётчик, не опуская его ниже нуля."""
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+class CounterFieldsMixin:
+    """Не перезаписывает счётчики при полном сохранении модели.
+
+    Счётчики меняет только change_counter, поэтому при сохранении
+    существующей строки без update_fields они исключаются из UPDATE:
+    иначе save() вернул бы в базу значения, прочитанные раньше.
+    """
+    counter_fields = ()
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        if (update_fields is None and not force_insert
+                and not self._state.adding):
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(force_insert, force_update, using, update_fields)
@@ -1,9 +1,12 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from .counters import CounterFieldsMixin
 
-class User(AbstractUser):
+
+class User(CounterFieldsMixin, AbstractUser):
     """Кастомная модель пользователя."""
+    counter_fields = ('recipes_count', 'followers_count')
     email = models.EmailField(
         verbose_name='Электронная почта',
         max_length=254,
@@ -22,6 +25,16 @@ class User(AbstractUser):
         verbose_name='Фамилия пользователя',
         max_length=150
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False,
+    )
 
     USERNAME_FIELD = 'email'
 